@@ -0,0 +1,82 @@
+# Measures the time from starting the Python interpreter until run.py
+# is ready to draw the main menu, and lists the heavy modules that are
+# loaded by then. Run from the repository root with:
+#     python3 benchmarks/startup.py [--runs 10] [--json startup.json]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pandas", "numpy", "IPython", "gspread", "google.auth"]
+
+# The child process imports run.py, which stops right before the main
+# menu because main() only runs when the file is executed directly.
+
+CHILD = f"""
+import json, sys, time
+start = time.perf_counter()
+import run
+ready = time.perf_counter()
+print(json.dumps({{"import": ready - start,
+                   "loaded": [name for name in {HEAVY_MODULES!r}
+                              if name in sys.modules]}}))
+"""
+
+
+def measure_once():
+    """
+    Starts a fresh interpreter that imports run.py.
+    Returns:
+        dictionary of the total time to the menu, the time spent
+        importing run.py and the heavy modules loaded.
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["total"] = total
+    return result
+
+
+def summarise(values):
+    """
+    Returns the median, minimum and maximum of a list of seconds in
+    milliseconds.
+    """
+    return {"median_ms": round(statistics.median(values) * 1000, 1),
+            "min_ms": round(min(values) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the time until run.py shows the main menu.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="file to write the results to")
+    args = parser.parse_args()
+    results = [measure_once() for attempt in range(args.runs)]
+    report = {"runs": args.runs,
+              "time_to_menu": summarise([r["total"] for r in results]),
+              "import_run_py": summarise([r["import"] for r in results]),
+              "heavy_modules_loaded": results[-1]["loaded"]}
+    print(f"Time to first menu: {report['time_to_menu']['median_ms']} ms"
+          f" median over {args.runs} runs"
+          f" (min {report['time_to_menu']['min_ms']},"
+          f" max {report['time_to_menu']['max_ms']})")
+    print(f"Importing run.py: {report['import_run_py']['median_ms']} ms"
+          " median")
+    print("Heavy modules loaded before the menu: "
+          + (", ".join(report["heavy_modules_loaded"]) or "none"))
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+# Measures each workflow and report of run.py against an in-memory
+# stand-in for the Google Sheets workbook, so no Google account is
+# needed. The stand-in models the latency of every API request and
+# counts them, and the prompts are answered from a script. Each
+# scenario runs in a fresh interpreter for every worksheet size and
+# the API calls, wall time and peak memory are reported. Run from the
+# repository root with:
+#     python3 benchmarks/workflows.py [--rows 1000 10000 100000]
+#         [--scenario place_employee ...] [--latency 0.2]
+#         [--json workflows.json]
+import argparse
+import builtins
+import collections
+import contextlib
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+# Google Sheets usually answers a request in 100 to 300 milliseconds.
+
+DEFAULT_LATENCY = 0.2
+DEFAULT_ROWS = [1000, 10000, 100000]
+IMPORT_ROWS = 100
+
+# The screen function run by each scenario and the answers given to
+# its prompts, in order. An answer starting with ~ selects the first
+# choice starting with the rest of it, {active} stands for the number
+# of an employee still in the pool and {new} for an unused number.
+# The reports show their first two pages.
+
+PAGER = ["Next page", "Return to the data tables"]
+
+SCENARIOS = {
+    "add_employee": ("add_employee",
+                     ["{new}", "Ann", "Lee", "40", "female", "Sales",
+                      "Rep", "5000", "3", "4", "02/02/2022"]),
+    "select_employee": ("select_employee", ["{active}"]),
+    "update_employee": ("update_employee",
+                        ["{active}", "Salary", "4500", "Age", "44",
+                         "Save changes", "No"]),
+    "place_employee": ("place_employee",
+                       ["{active}", "Increase", "Hr", "Lead", "99000"]),
+    "retrench_employee": ("retrench_employee", ["{active}"]),
+    "import_employees": ("import_employees", ["{import_file}"]),
+    "summary_report": ("summary_report", PAGER),
+    "personal_details_report": ("personal_details_report", PAGER),
+    "department_position_report": ("department_position_report", PAGER),
+    "placed_employees_report": ("placed_employees_report", PAGER),
+    "salary_comparison_report": ("salary_comparison_report", PAGER),
+    "days_within_pool_report": ("days_within_pool_report", PAGER),
+    "salary_and_tenure_report": ("salary_and_tenure_report", PAGER),
+    "retrenched_report": ("retrenched_report", PAGER),
+    }
+
+RANGE_PATTERN = re.compile(r"'(?P<worksheet>[^']+)'(!(?P<first_col>[A-Z]+)"
+                           r"(?P<first_row>\d*):(?P<last_col>[A-Z]+)"
+                           r"(?P<last_row>\d*))?")
+
+
+class FakeWorksheet:
+    """
+    In-memory stand-in for a gspread worksheet, holding its rows as
+    lists of strings.
+    """
+
+    def __init__(self, spreadsheet, rows, sheet_id):
+        self.spreadsheet = spreadsheet
+        self.rows = rows
+        self.id = sheet_id
+
+    def get_all_values(self):
+        self.spreadsheet.request("get_all_values")
+        width = max(len(row) for row in self.rows)
+        return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def row_values(self, row_no):
+        self.spreadsheet.request("row_values")
+        row = list(self.rows[row_no - 1]) if row_no <= len(self.rows) else []
+        return storage.strip_trailing(row)
+
+    def col_values(self, col_no):
+        self.spreadsheet.request("col_values")
+        return storage.strip_trailing([row[col_no - 1]
+                                       if len(row) >= col_no else ""
+                                       for row in self.rows])
+
+
+class FakeSpreadsheet:
+    """
+    In-memory stand-in for a gspread spreadsheet. Every request sleeps
+    for the modelled latency and is counted by its gspread method name.
+    """
+
+    def __init__(self, worksheets, latency):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.sheets = {name: FakeWorksheet(self, rows, sheet_id)
+                       for sheet_id, (name, rows) in enumerate(
+                           worksheets.items())}
+
+    def request(self, method):
+        self.calls[method] += 1
+        time.sleep(self.latency)
+
+    def worksheet(self, name):
+        self.request("worksheet")
+        return self.sheets[name]
+
+    def values_batch_get(self, ranges):
+        self.request("values_batch_get")
+        value_ranges = []
+        for a1_range in ranges:
+            match = RANGE_PATTERN.fullmatch(a1_range)
+            rows = self.sheets[match["worksheet"]].rows
+            if match["first_col"] is None:
+                value_ranges.append({"range": a1_range,
+                                     "values": [list(row) for row in rows]})
+                continue
+            first = column_number(match["first_col"]) - 1
+            last = column_number(match["last_col"])
+            values = [storage.strip_trailing(list(row[first:last]))
+                      for row in rows]
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({"range": a1_range, "values": values})
+        return {"valueRanges": value_ranges}
+
+    def values_append(self, a1_range, params, body):
+        self.request("values_append")
+        worksheet = a1_range.partition("!")[0].strip("'")
+        rows = self.sheets[worksheet].rows
+        while rows and not any(rows[-1]):
+            rows.pop()
+        first_row = len(rows) + 1
+        rows.extend([str(value) for value in values]
+                    for values in body["values"])
+        return {"updates": {"updatedRange": f"'{worksheet}'!A{first_row}:"
+                                            f"N{len(rows)}"}}
+
+    def batch_update(self, body):
+        """
+        Applies the AppendCellsRequests and UpdateCellsRequests of a
+        spreadsheets.batchUpdate request.
+        """
+        self.request("batch_update")
+        sheets = {sheet.id: sheet for sheet in self.sheets.values()}
+        for request in body["requests"]:
+            if "appendCells" in request:
+                append = request["appendCells"]
+                rows = sheets[append["sheetId"]].rows
+                while rows and not any(rows[-1]):
+                    rows.pop()
+                rows.extend([cell_text(cell) for cell in row["values"]]
+                            for row in append["rows"])
+                continue
+            update = request["updateCells"]
+            grid = update["range"]
+            rows = sheets[grid["sheetId"]].rows
+            while len(rows) < grid["endRowIndex"]:
+                rows.append([])
+            row = rows[grid["startRowIndex"]]
+            values = [cell_text(cell) for cell in update["rows"][0]["values"]]
+            first = grid["startColumnIndex"]
+            if len(row) < first + len(values):
+                row.extend([""] * (first + len(values) - len(row)))
+            row[first:first + len(values)] = values
+        return {"replies": [{} for request in body["requests"]]}
+
+    def values_batch_update(self, body):
+        self.request("values_batch_update")
+        for value_range in body["data"]:
+            match = RANGE_PATTERN.fullmatch(value_range["range"])
+            rows = self.sheets[match["worksheet"]].rows
+            row_no = int(match["first_row"])
+            col_no = column_number(match["first_col"])
+            while len(rows) < row_no:
+                rows.append([])
+            row = rows[row_no - 1]
+            values = [str(value) for value in value_range["values"][0]]
+            if len(row) < col_no - 1 + len(values):
+                row.extend([""] * (col_no - 1 + len(values) - len(row)))
+            row[col_no - 1:col_no - 1 + len(values)] = values
+
+
+class FakeSheetsBackend(storage.SheetsBackend):
+    """
+    The Google Sheets backend connected to a FakeSpreadsheet instead of
+    the workbook, with a scheduler that never waits for the quota.
+    """
+
+    def __init__(self, spreadsheet):
+        self.scheduler = storage.RequestScheduler(requests_per_minute=1e9,
+                                                  burst=1e9)
+        self.client = None
+        self.spreadsheet = spreadsheet
+        self.worksheets = {}
+        self.worksheets_lock = threading.Lock()
+
+
+def cell_text(cell):
+    """
+    Returns the value of a CellData as the text the sheet would show.
+    """
+    value = cell.get("userEnteredValue", {})
+    if "numberValue" in value:
+        number = value["numberValue"]
+        return str(int(number) if float(number).is_integer() else number)
+    return value.get("stringValue", "")
+
+
+def column_number(letters):
+    """
+    Returns the column number of A1 column letters, e.g. AB is 28.
+    """
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def seed_worksheets(rows):
+    """
+    Builds the three worksheets with the given number of employees in
+    the redeployment pool, every tenth of them placed and every tenth
+    retrenched.
+    Returns:
+        dictionary of worksheet name to list of rows.
+    """
+    pool = [list(storage.WORKSHEET_HEADERS["redeployment_pool"])]
+    placed = [list(storage.WORKSHEET_HEADERS["placed_employees"])]
+    retrenched = [list(storage.WORKSHEET_HEADERS["retrenched_employees"])]
+    for number in range(rows):
+        emp = str(100000 + number)
+        name, surname = f"Name{number}", f"Surname{number}"
+        salary = 1000 + number % 49000
+        row = [emp, name, surname, str(18 + number % 58),
+               ["male", "female", "unknown"][number % 3],
+               f"Department{number % 12}", f"Position{number % 40}",
+               str(salary), str(1 + number % 50), str(1 + number % 10),
+               f"{1 + number % 28:02d}/{1 + number % 12:02d}/2021"]
+        if number % 10 == 0:
+            placed.append([emp, name, surname, "Hr", "Lead", str(salary),
+                           str(salary + 500), "500", "Incr."])
+            pool.append(row + ["01/06/2022", str(150 + number % 300),
+                               "Placed"])
+        elif number % 10 == 1:
+            package = salary * (1 + number % 50)
+            retrenched.append([emp, name, surname, str(package)])
+            pool.append(row + ["01/06/2022", str(150 + number % 300),
+                               "Retren."])
+        else:
+            pool.append(row + [" ", " ", "Active"])
+    return {"redeployment_pool": pool, "placed_employees": placed,
+            "retrenched_employees": retrenched}
+
+
+def write_import_file(path, rows):
+    """
+    Writes a CSV file of new employees to import.
+    """
+    import run
+
+    with open(path, "w") as import_file:
+        import_file.write(",".join(run.IMPORT_HEADERS) + "\n")
+        for number in range(IMPORT_ROWS):
+            import_file.write(f"{900000 + number},Imported,Employee,30,"
+                              f"female,Sales,Rep,5000,3,4,01/01/2021\n")
+
+
+def run_scenario(scenario, rows, latency):
+    """
+    Runs one scenario against seeded worksheets in this interpreter.
+    The wall time is the time until the user gets control back, while
+    the API calls include the journalled writes flushed afterwards.
+    Returns:
+        dictionary of the API calls by method, the wall time in seconds
+        and the peak resident memory before and during the scenario.
+    """
+    os.chdir(ROOT)
+    import journal
+    import run
+    import pandas  # noqa: F401
+    import IPython.display
+
+    spreadsheet = FakeSpreadsheet(seed_worksheets(rows), latency)
+    screen, script = SCENARIOS[scenario]
+    with tempfile.TemporaryDirectory() as directory:
+        run.BACKEND = journal.JournalledBackend(
+            FakeSheetsBackend(spreadsheet),
+            directory=os.path.join(directory, "journal"))
+        import_file = os.path.join(directory, "employees.csv")
+        write_import_file(import_file, rows)
+        fields = {"active": str(100000 + rows // 2 + 2), "new": "999999",
+                  "import_file": import_file}
+        answers = [answer.format(**fields) for answer in script]
+
+        def answer_prompt(questions):
+            answer = answers.pop(0)
+            if answer.startswith("~"):
+                answer = next(choice for choice in questions[0]["choices"]
+                              if choice.startswith(answer[1:]))
+            return {0: answer}
+
+        run.prompt = answer_prompt
+        builtins.input = lambda message="": answers.pop(0)
+        IPython.display.display = lambda *objects: None
+        memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            getattr(run, screen)()
+            seconds = time.perf_counter() - start
+        run.BACKEND.drain()
+        memory_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if answers:
+        raise RuntimeError(f"{scenario} left the answers {answers} unused")
+    return {"scenario": scenario, "rows": rows,
+            "calls": sum(spreadsheet.calls.values()),
+            "calls_by_method": dict(spreadsheet.calls),
+            "seconds": round(seconds, 4),
+            "peak_rss_mb": round(memory_peak / 1024, 1),
+            "rss_growth_mb": round((memory_peak - memory_before) / 1024, 1)}
+
+
+def measure(scenario, rows, latency):
+    """
+    Runs a scenario in a fresh interpreter, so that no cache or memory
+    peak is carried over from another scenario.
+    """
+    output = subprocess.run([sys.executable, os.path.abspath(__file__),
+                             "--child", scenario, "--rows", str(rows),
+                             "--latency", str(latency)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f"{scenario} at {rows} rows failed:\n"
+                           f"{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the workflows and reports of run.py"
+                    " against an in-memory Google Sheets stand-in.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS,
+                        default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help="seconds each API request takes")
+    parser.add_argument("--json", help="file to write the results to")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.rows[0],
+                                      args.latency)))
+        return
+    results = []
+    print(f"{'scenario':<28}{'rows':>8}{'calls':>7}{'wall ms':>10}"
+          f"{'peak MB':>9}{'growth MB':>11}")
+    for rows in args.rows:
+        for scenario in args.scenario:
+            result = measure(scenario, rows, args.latency)
+            results.append(result)
+            print(f"{scenario:<28}{rows:>8}{result['calls']:>7}"
+                  f"{result['seconds'] * 1000:>10.1f}"
+                  f"{result['peak_rss_mb']:>9}{result['rss_growth_mb']:>11}")
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"latency": args.latency, "results": results},
+                      json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ const PythonShell = require('python-shell')['PythonShell'];
 const static = require('node-static');
 const http = require('http');
 const fs = require('fs');
+const net = require('net');
+
+const SESSION_SOCKET = process.env.SESSION_SOCKET || 'sessions.sock';
 
 var static_serve = new(static.Server)('./static');
 
@@ -10,10 +13,89 @@ const server = http.createServer(function (req, res) {
     static_serve.serve(req, res);
 })
 
+// Starts session_server.py once, which keeps warm run.py sessions
+// waiting on SESSION_SOCKET so a new connection does not pay for the
+// interpreter start, the imports and the Google authentication.
+function start_session_pool() {
+    let pool = new PythonShell('session_server.py');
+
+    pool.on('message', (message) => {
+        console.log('Session pool: ', message);
+    });
+
+    pool.on('close', () => {
+        console.log('Session pool ended');
+    });
+
+    pool.on('error', (message) => {
+        console.log('Session pool error:', message);
+    });
+}
+
+if (process.env.CREDS != null) {
+    fs.writeFileSync('creds.json', process.env.CREDS, 'utf8');
+}
+start_session_pool();
+
 const io = require('socket.io')(server);
 io.on('connection', (socket) => {
     console.log("Socket Connected");
-    
+
+    // Connects the socket to a warm session from the pool, falling
+    // back to starting run.py when the pool is not available.
+    function run_pooled_session() {
+        let session = net.createConnection(SESSION_SOCKET);
+        let connected = false;
+        let pending = '';
+
+        session.setEncoding('utf8');
+
+        session.on('connect', () => {
+            connected = true;
+        });
+
+        session.on('data', (data) => {
+            pending += data;
+            let lines = pending.split('\n');
+            pending = lines.pop();
+            lines.forEach((message) => {
+                console.log('process Out: ', message);
+                try {
+                    socket.emit("console_output", message);
+                } catch (e) {
+                    console.log('Cannot write to socket', e);
+                }
+            });
+        });
+
+        session.on('close', () => {
+            if (connected) {
+                console.log('Process ended');
+            }
+        });
+
+        session.on('error', (e) => {
+            if (!connected) {
+                console.log('Session pool unavailable, starting run.py', e.code);
+                run_python_script();
+            } else {
+                console.log('Session error:', e);
+            }
+        });
+
+        socket.on('disconnect', () =>  {
+            console.log("Socket Disconnected");
+            session.destroy();
+        });
+
+        socket.on('command_entered', (command) =>  {
+            console.log("Socket Command: ", command);
+            if (connected) {
+                session.write(command + '\n');
+            }
+        });
+    }
+
     function run_python_script() {
         try {
             let pyshell = new PythonShell('run.py');
@@ -66,18 +148,7 @@ io.on('connection', (socket) => {
         }
     }
 
-    if (process.env.CREDS != null) {
-        fs.writeFile('creds.json', process.env.CREDS, 'utf8', function(err) {
-            if (err) {
-                console.log('Error writing file: ', err);
-                socket.emit("console_output", "Error saving credentials: " + err);
-            } else {
-                run_python_script();
-            }
-        });
-    } else {
-        run_python_script();
-    }
+    run_pooled_session();
 });
 
 console.log('Starting node on port', process.env.PORT);
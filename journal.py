@@ -0,0 +1,531 @@
+# Write-behind journal for the storage backend. Every write made by
+# run.py is appended to a local journal file and synced to disk, and
+# control returns to the user at once. A background thread sends the
+# pending writes to the backend in batches, retrying while the backend
+# cannot be reached. Reads see the pending writes as if they had been
+# made. Each process keeps its own journal, named after its process
+# id, and journals left behind by a process that has stopped are
+# replayed when the next session starts, or by the session server once
+# it has reaped the process. New rows are journalled as
+# appends, so they are given their row by the backend when they are
+# sent, never a row another session may have used since. A write that
+# may already have been sent, because its flush failed part way or its
+# journal is being replayed, does not append an employee number that
+# is already in the worksheet, so no row is ever appended twice. The
+# row of an employee appended in this session may be given by its
+# Emp Number, which is looked up when the write is sent.
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import profiling
+import storage
+
+# The journals are kept in REDEPLOYMENT_JOURNAL_DIR. A failed flush is
+# retried after a jittered delay doubling from JOURNAL_RETRY_DELAY up
+# to JOURNAL_MAX_DELAY seconds. Writes the backend refuses outright
+# are set aside in REJECTED_FILE.
+
+JOURNAL_DIR = os.environ.get("REDEPLOYMENT_JOURNAL_DIR", "journal")
+JOURNAL_RETRY_DELAY = 1
+JOURNAL_MAX_DELAY = 60
+REJECTED_FILE = "rejected.log"
+
+
+class JournalledBackend(storage.StorageBackend):
+    """
+    Passes reads on to another backend and queues writes in a journal,
+    from which a background thread flushes them to that backend.
+    """
+
+    def __init__(self, backend, directory=JOURNAL_DIR):
+        self.backend = backend
+        self.directory = directory
+        self.path = None
+        os.makedirs(directory, exist_ok=True)
+        claimed = self.claim_stale_journals()
+        self.open_journal()
+        self.replay(claimed)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def replay_stale_journals(self):
+        """
+        Queues the writes left pending in the journals of processes that
+        are no longer running, such as sessions that ended before their
+        writes were saved.
+        Returns:
+            the number of writes queued.
+        """
+        return self.replay(self.claim_stale_journals())
+
+    def replay(self, claimed):
+        """
+        Queues the writes left pending in claimed journals and removes
+        the journals. The writes may have been sent before the process
+        stopped, so their new rows are checked for when they are sent.
+        Returns:
+            the number of writes queued.
+        """
+        count = 0
+        for path in claimed:
+            for updates in read_pending(path):
+                self.queue(updates, maybe_sent=True)
+                count += 1
+            os.remove(path)
+        return count
+
+    def claim_stale_journals(self):
+        """
+        Renames the journals of processes that are no longer running, so
+        that no other session replays them too.
+        Returns:
+            list of paths of the claimed journals.
+        """
+        claimed = []
+        for name in sorted(os.listdir(self.directory)):
+            process_id, extension = os.path.splitext(name)
+            if extension != ".log" or not process_id.isdigit():
+                continue
+            path = os.path.join(self.directory, name)
+            if path == self.path or (int(process_id) != os.getpid()
+                                     and process_running(int(process_id))):
+                continue
+            claim = f"{path}.{os.getpid()}.replay"
+            try:
+                os.rename(path, claim)
+            except FileNotFoundError:
+                continue
+            claimed.append(claim)
+        return claimed
+
+    def open_journal(self):
+        """
+        Opens the journal of this process and starts the flusher thread.
+        """
+        self.path = os.path.join(self.directory, f"{os.getpid()}.log")
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pending = []
+        self.maybe_sent = set()
+        self.appended = set()
+        self.next_id = 1
+        self.flusher = threading.Thread(target=self.flush_forever,
+                                        daemon=True)
+        self.flusher.start()
+
+    def append(self, entry):
+        """
+        Appends an entry to the journal file and syncs it to disk.
+        Must be called holding the lock.
+        """
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def write_cells(self, updates):
+        """
+        Records the updates in the journal and returns once they are
+        safely on disk. They are sent to the backend in the background,
+        and their backend calls are profiled under the action making
+        the write.
+        Returns:
+            list of the row number of each update, None for new rows,
+            as their rows are only known once they are sent.
+        """
+        return self.queue(updates)
+
+    def queue(self, updates, maybe_sent=False):
+        """
+        Records the updates in the journal and queues them for the
+        flusher thread.
+        Args:
+            updates - list of [worksheet, row, column, values] updates,
+            where the row is a number, None for a new row or an
+            employee_key(), maybe_sent - True if the updates may already
+            have been sent, as when replaying a journal.
+        Returns:
+            list of the row of each update.
+        """
+        updates = [[worksheet, row_no, col_no, list(values)]
+                   for worksheet, row_no, col_no, values in updates]
+        action = profiling.PROFILE.current_action()
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.append({"write": entry_id, "updates": updates,
+                         "action": action})
+            self.pending.append((entry_id, updates, action))
+            if maybe_sent:
+                self.maybe_sent.add(entry_id)
+            self.appended.update((worksheet, str(values[0]))
+                                 for worksheet, row_no, col_no, values
+                                 in updates if row_no is None and col_no == 1)
+            self.changed.notify_all()
+        return [row_no for worksheet, row_no, col_no, values in updates]
+
+    def flush_forever(self):
+        """
+        Sends the pending writes to the backend, all those made by the
+        same action in one batch, and marks those written as flushed in
+        the journal, so that a batch written in part is not sent again
+        in full. Runs in the flusher thread.
+        """
+        attempt = 0
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.changed.wait()
+                action = self.pending[0][2]
+                batch = list(itertools.takewhile(
+                    lambda entry: entry[2] == action, self.pending))
+            with profiling.PROFILE.acting(action):
+                flushed = self.flush(batch)
+            if not flushed:
+                delay = min(JOURNAL_MAX_DELAY,
+                            JOURNAL_RETRY_DELAY * 2 ** attempt)
+                time.sleep(random.uniform(delay / 2, delay))
+                attempt += 1
+                continue
+            attempt = 0
+            with self.lock:
+                del self.pending[:flushed]
+                self.maybe_sent.difference_update(
+                    entry[0] for entry in batch[:flushed])
+                if self.pending:
+                    self.append({"flushed": batch[flushed - 1][0]})
+                else:
+                    self.file.seek(0)
+                    self.file.truncate()
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                self.changed.notify_all()
+
+    def flush(self, batch):
+        """
+        Writes a batch of journal entries to the backend. If the backend
+        refuses the batch for a reason retrying cannot fix, the entries
+        are written one by one and the refused ones are set aside. The
+        entries of a failed write may have been sent, so when they are
+        written again their new rows are checked for first.
+        Args:
+            batch - list of (entry id, updates, action) tuples.
+        Returns:
+            the number of entries at the start of the batch written or
+            set aside, 0 if the first should be retried later.
+        """
+        try:
+            entries, updates = self.resolve(batch)
+            if updates:
+                self.backend.write_cells(updates)
+            return len(entries)
+        except Exception as e:
+            with self.lock:
+                self.maybe_sent.update(entry[0] for entry in batch)
+            if transient(e):
+                return 0
+            if len(batch) > 1:
+                flushed = 0
+                while flushed < len(batch) and self.flush([batch[flushed]]):
+                    flushed += 1
+                return flushed
+            self.reject(batch[0], e)
+            return 1
+
+    def resolve(self, batch):
+        """
+        Prepares a batch of journal entries for writing. Rows given by
+        Emp Number are looked up in the worksheet, and the new rows of
+        entries that may already have been sent are left out if their
+        employee number is already there. An employee number is in
+        column A of every worksheet and at most once in each, so such a
+        row was appended when the entry was sent before. The batch is
+        cut before an entry whose employee is not found yet, as the row
+        it waits for is appended by an entry before it.
+        Args:
+            batch - list of (entry id, updates, action) tuples.
+        Returns:
+            tuple of the entries to write and the list of their updates.
+        Raises:
+            LookupError if the employee of the first entry is not found.
+        """
+        with self.lock:
+            maybe_sent = [entry[0] in self.maybe_sent for entry in batch]
+        worksheets = sorted({update[0]
+                             for entry, sent in zip(batch, maybe_sent)
+                             for update in entry[1]
+                             if isinstance(update[1], dict)
+                             or (sent and update[1] is None)})
+        rows = {worksheet: employee_rows(self.backend.col_values(worksheet,
+                                                                 1))
+                for worksheet in worksheets}
+        entries = []
+        updates = []
+        for entry, sent in zip(batch, maybe_sent):
+            entry_updates = []
+            for worksheet, row_no, col_no, values in entry[1]:
+                if isinstance(row_no, dict):
+                    emp_number = row_no["Emp Number"]
+                    if emp_number not in rows[worksheet]:
+                        if entries:
+                            return entries, updates
+                        raise LookupError(f"employee number {emp_number}"
+                                          f" was not found in {worksheet}")
+                    row_no = rows[worksheet][emp_number]
+                elif (sent and row_no is None and col_no == 1
+                        and str(values[0]) in rows[worksheet]):
+                    continue
+                entry_updates.append([worksheet, row_no, col_no, values])
+            entries.append(entry)
+            updates.extend(entry_updates)
+        return entries, updates
+
+    def reject(self, entry, error):
+        """
+        Sets aside a journal entry the backend refused, so that it does
+        not hold back the writes queued after it.
+        """
+        print(f"A change could not be saved and was set aside: {error}")
+        with open(os.path.join(self.directory, REJECTED_FILE), "a",
+                  encoding="utf-8") as rejected:
+            rejected.write(json.dumps({"write": entry[0],
+                                       "updates": entry[1],
+                                       "error": str(error)}) + "\n")
+
+    def drain(self, timeout=None):
+        """
+        Waits for the pending writes to be flushed.
+        Args:
+            timeout - seconds to wait at most, or None to wait for ever.
+        Returns:
+            True if nothing is left pending.
+        """
+        with self.lock:
+            return self.changed.wait_for(lambda: not self.pending, timeout)
+
+    def pending_count(self):
+        with self.lock:
+            return len(self.pending)
+
+    def appends_employee(self, worksheet, emp_number):
+        """
+        Checks whether this session has appended a row for an employee
+        to a worksheet. The row is only known for sure once the append
+        has been sent, so writes to it give the row by employee_key().
+        """
+        with self.lock:
+            return (worksheet, emp_number) in self.appended
+
+    def pending_updates(self, worksheet):
+        """
+        Returns the pending updates of a worksheet, in order. Reads take
+        them before reading the backend, so a flush finishing during the
+        read cannot hide a write from them.
+        """
+        with self.lock:
+            return [update for entry_id, entry, action in self.pending
+                    for update in entry if update[0] == worksheet]
+
+    def get_all_values(self, worksheet):
+        updates = self.pending_updates(worksheet)
+        return pad(overlay(updates, self.backend.get_all_values(worksheet)))
+
+    def get_worksheets(self, worksheets):
+        updates = {worksheet: self.pending_updates(worksheet)
+                   for worksheet in worksheets}
+        return {worksheet: pad(overlay(updates[worksheet], values))
+                for worksheet, values in
+                self.backend.get_worksheets(worksheets).items()}
+
+    def row_values(self, worksheet, row_no):
+        updates = self.pending_updates(worksheet)
+        if any(not isinstance(update[1], int) for update in updates):
+            # Where the new rows go depends on the length of the sheet,
+            # and the rows given by Emp Number on column A, which a
+            # single row does not tell.
+            rows = self.get_all_values(worksheet)
+            return storage.strip_trailing(
+                list(rows[row_no - 1]) if row_no <= len(rows) else [])
+        rows = overlay(updates, [self.backend.row_values(worksheet, row_no)],
+                       first_row=row_no)
+        return storage.strip_trailing(list(rows[0]))
+
+    def col_values(self, worksheet, col_no):
+        updates = self.pending_updates(worksheet)
+        if col_no != 1 and any(isinstance(update[1], dict)
+                               for update in updates):
+            rows = self.get_column_spans(worksheet, [(col_no, col_no)])[0]
+        else:
+            rows = overlay(updates,
+                           [[value] for value in
+                            self.backend.col_values(worksheet, col_no)],
+                           first_col=col_no, last_col=col_no)
+        return storage.strip_trailing([row[0] if row else ""
+                                       for row in rows])
+
+    def get_column_spans(self, worksheet, spans):
+        updates = self.pending_updates(worksheet)
+        # Rows given by Emp Number are found on column A, which is read
+        # along with the spans if none of them holds it.
+        keyed = (any(isinstance(update[1], dict) for update in updates)
+                 and all(first != 1 for first, last in spans))
+        blocks = self.backend.get_column_spans(
+            worksheet, [(1, 1)] + list(spans) if keyed else spans)
+        end_row = max((len(block) for block in blocks), default=0) + 1
+        emp_numbers = None
+        if keyed:
+            emp_numbers = [row[0] if row else "" for row in blocks.pop(0)]
+        return [overlay(updates, block, first_col=first, last_col=last,
+                        end_row=end_row, emp_numbers=emp_numbers)
+                for (first, last), block in zip(spans, blocks)]
+
+    def close(self):
+        """
+        Removes the journal of this process when nothing is left
+        pending in it. Otherwise it stays to be replayed later.
+        """
+        with self.lock:
+            if not self.pending:
+                self.file.close()
+                os.remove(self.path)
+
+    def after_fork(self):
+        """
+        Gives the forked session its own journal and flusher thread, as
+        threads do not survive a fork.
+        """
+        self.backend.after_fork()
+        self.file.close()
+        self.open_journal()
+
+
+def overlay(updates, rows, first_row=1, first_col=1, last_col=None,
+            end_row=None, emp_numbers=None):
+    """
+    Applies pending updates to values read from the backend. New rows
+    are added below the last row, where the backend will append them
+    unless another session appends first. Rows given by Emp Number are
+    those of the new rows, or else of the rows read.
+    Args:
+        updates - list of [worksheet, row, column, values] updates,
+        rows - list of rows read, starting at first_row and first_col,
+        last_col - the last column read, None for all,
+        end_row - the row number new rows start at, None for the row
+        after those read,
+        emp_numbers - the Emp Number of each row read, None to take it
+        from the rows, which then must start at column A.
+    Returns:
+        the rows with the updates applied, copied if there were any.
+    """
+    if not updates:
+        return rows
+    if emp_numbers is None and first_col == 1:
+        emp_numbers = [row[0] if row else "" for row in rows]
+    found = employee_rows(emp_numbers or [], first_row)
+    rows = [list(row) for row in rows]
+    if end_row is None:
+        end_row = first_row + len(rows)
+    for worksheet, row_no, col_no, values in updates:
+        if row_no is None:
+            row_no = end_row
+            end_row += 1
+            if col_no == 1:
+                found.setdefault(str(values[0]), row_no)
+        elif isinstance(row_no, dict):
+            row_no = found.get(row_no["Emp Number"])
+            if row_no is None:
+                continue
+        position = row_no - first_row
+        if position < 0:
+            continue
+        while len(rows) <= position:
+            rows.append([])
+        row = rows[position]
+        for col, value in enumerate(values, start=col_no):
+            if col < first_col or (last_col is not None and col > last_col):
+                continue
+            while len(row) <= col - first_col:
+                row.append("")
+            row[col - first_col] = "" if value is None else str(value)
+    return rows
+
+
+def employee_key(emp_number):
+    """
+    Returns the row of an employee as a journal update gives it when
+    the row number is not known for sure.
+    """
+    return {"Emp Number": emp_number}
+
+
+def employee_rows(emp_numbers, first_row=1):
+    """
+    Maps each employee number of an Emp Number column to its first row.
+    """
+    rows = {}
+    for row_no, emp_number in enumerate(emp_numbers, start=first_row):
+        if emp_number:
+            rows.setdefault(emp_number, row_no)
+    return rows
+
+
+def read_pending(path):
+    """
+    Reads the writes of a journal that were not marked as flushed. A
+    line cut short by a crash is ignored.
+    Args:
+        path - string path of the journal.
+    Returns:
+        list of the updates of each pending write, in order.
+    """
+    writes = []
+    flushed = 0
+    with open(path, encoding="utf-8") as journal_file:
+        for line in journal_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "write" in entry:
+                writes.append((entry["write"], entry["updates"]))
+            elif "flushed" in entry:
+                flushed = max(flushed, entry["flushed"])
+    return [updates for entry_id, updates in writes if entry_id > flushed]
+
+
+def process_running(process_id):
+    """
+    Checks whether a process with the given id is running.
+    """
+    try:
+        os.kill(process_id, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def transient(error):
+    """
+    Checks whether a failed flush may succeed later, as when the
+    network is down or the database is locked for a while.
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        return "locked" in str(error)
+    return storage.retryable(error) or isinstance(error, OSError)
+
+
+def pad(rows):
+    """
+    Pads rows to the same length, as get_all_values returns them.
+    """
+    width = max((len(row) for row in rows), default=0)
+    if all(len(row) == width for row in rows):
+        return rows
+    return [list(row) + [""] * (width - len(row)) for row in rows]
@@ -0,0 +1,371 @@
+# Instrumentation of the storage backend calls made by run.py.
+# Every call is timed and measured and filed under the menu action
+# that was running when it was made, so the cost of each workflow in
+# backend calls, bytes and latency can be printed at the end of the
+# session or appended to a JSON lines file to be tracked over time.
+# Below the backend calls, every Google Sheets API request the
+# scheduler sends is recorded too, with its retries and the requests
+# refused for the quota, under the backend method that sent it.
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import storage
+
+# REDEPLOYMENT_PROFILE selects where the profile goes when the session
+# ends: "print" prints it, any other value is the name of the file the
+# profile is appended to as one line of JSON.
+
+PROFILE_TARGET = os.environ.get("REDEPLOYMENT_PROFILE", "")
+
+PERCENTILES = (50, 90, 99)
+
+
+class CallProfile:
+    """
+    Counts the backend calls, the bytes they carried and their latency
+    for each action, as well as the time spent in each action and the
+    API requests sent by each backend method.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets everything recorded so far and starts a new session.
+        """
+        with self.lock:
+            self.action = "startup"
+            self.started = time.time()
+            self.calls = {}
+            self.requests = {}
+            self.screens = {}
+
+    def current_action(self):
+        """
+        Returns the action the calls of this thread are filed under,
+        which is the active action unless set with acting().
+        """
+        return getattr(self.local, "action", None) or self.action
+
+    @contextlib.contextmanager
+    def acting(self, action):
+        """
+        Files the calls made by this thread within the block under the
+        given action, for work done in the background for an action
+        other than the one active at the time.
+        """
+        previous = getattr(self.local, "action", None)
+        self.local.action = action
+        try:
+            yield
+        finally:
+            self.local.action = previous
+
+    @contextlib.contextmanager
+    def calling(self, method):
+        """
+        Files the API requests made by this thread within the block
+        under the given backend method.
+        """
+        previous = getattr(self.local, "method", None)
+        self.local.method = method
+        try:
+            yield
+        finally:
+            self.local.method = previous
+
+    def record(self, method, seconds, size):
+        """
+        Records one backend call under the action of this thread.
+        Args:
+            method - string name of the backend method,
+            seconds - float latency, size - integer bytes read or written.
+        """
+        with self.lock:
+            stats = self.calls.setdefault(
+                (self.current_action(), method),
+                {"calls": 0, "bytes": 0, "latencies": []})
+            stats["calls"] += 1
+            stats["bytes"] += size
+            stats["latencies"].append(seconds)
+
+    def record_request(self, request, attempt, seconds, error):
+        """
+        Records one attempt at an API request under the action and the
+        backend method of this thread, "connect" outside any method.
+        Args:
+            request - string name of the request, attempt - integer
+            attempt number, 0 for the first, seconds - float latency,
+            error - the exception it failed with, None if it succeeded.
+        """
+        method = getattr(self.local, "method", None) or "connect"
+        with self.lock:
+            stats = self.requests.setdefault(
+                (self.current_action(), method, request),
+                {"requests": 0, "retries": 0, "refused": 0, "errors": 0,
+                 "latencies": []})
+            stats["requests"] += 1
+            stats["retries"] += attempt > 0
+            if error is not None:
+                stats["errors"] += 1
+                stats["refused"] += storage.refused(error)
+            stats["latencies"].append(seconds)
+
+    def move(self, source, target):
+        """
+        Files the calls recorded so far under one action under another,
+        as when the calls prefetching data turn out to serve a screen.
+        Args:
+            source - string action to move the calls from,
+            target - string action to add them to.
+        """
+        with self.lock:
+            for (action, method) in [key for key in self.calls
+                                     if key[0] == source]:
+                stats = self.calls.pop((action, method))
+                merged = self.calls.setdefault(
+                    (target, method),
+                    {"calls": 0, "bytes": 0, "latencies": []})
+                merged["calls"] += stats["calls"]
+                merged["bytes"] += stats["bytes"]
+                merged["latencies"].extend(stats["latencies"])
+            for (action, method, request) in [key for key in self.requests
+                                              if key[0] == source]:
+                stats = self.requests.pop((action, method, request))
+                merged = self.requests.setdefault(
+                    (target, method, request),
+                    {"requests": 0, "retries": 0, "refused": 0, "errors": 0,
+                     "latencies": []})
+                for key in ("requests", "retries", "refused", "errors"):
+                    merged[key] += stats[key]
+                merged["latencies"].extend(stats["latencies"])
+
+    def record_screen(self, action, seconds):
+        """
+        Records one run of a menu action and the time it took, waiting
+        for the user included.
+        """
+        with self.lock:
+            stats = self.screens.setdefault(action, {"runs": 0, "seconds": 0})
+            stats["runs"] += 1
+            stats["seconds"] += seconds
+
+    def report(self):
+        """
+        Summarises the profile by action, API request and backend method.
+        Returns:
+            dictionary of the session start, its duration and, for each
+            action, its runs and time, the count, retries, refusals,
+            errors, total time and latency percentiles of each API
+            request it sent, and the count, bytes, total time and
+            latency percentiles of each backend method it called with
+            the API requests the method sent.
+        """
+        with self.lock:
+            actions = {}
+            for action, stats in self.screens.items():
+                actions[action] = new_action_summary(stats["runs"],
+                                                     stats["seconds"])
+            for (action, method), stats in sorted(self.calls.items()):
+                summary = actions.setdefault(action, new_action_summary())
+                method_summary = {"calls": stats["calls"],
+                                  "bytes": stats["bytes"],
+                                  **latency_summary(stats["latencies"]),
+                                  "requests": {}}
+                summary["methods"][method] = method_summary
+                summary["calls"] += stats["calls"]
+                summary["bytes"] += stats["bytes"]
+                summary["backend_seconds"] = round(
+                    summary["backend_seconds"] + method_summary["seconds"], 3)
+            for (action, method, request), stats in sorted(
+                    self.requests.items()):
+                summary = actions.setdefault(action, new_action_summary())
+                request_summary = summary["api_requests"].setdefault(
+                    request, {"requests": 0, "retries": 0, "refused": 0,
+                              "errors": 0, "latencies": []})
+                for key in ("requests", "retries", "refused", "errors"):
+                    request_summary[key] += stats[key]
+                    summary[key] += stats[key]
+                request_summary["latencies"].extend(stats["latencies"])
+                method_summary = summary["methods"].setdefault(
+                    method, {"calls": 0, "bytes": 0,
+                             **latency_summary([]), "requests": {}})
+                method_summary["requests"][request] = stats["requests"]
+            for summary in actions.values():
+                summary["api_requests"] = dict(sorted(
+                    summary["api_requests"].items()))
+                for request_summary in summary["api_requests"].values():
+                    request_summary.update(latency_summary(
+                        request_summary.pop("latencies")))
+            return {"started": datetime.fromtimestamp(
+                        self.started).isoformat(timespec="seconds"),
+                    "seconds": round(time.time() - self.started, 3),
+                    "actions": actions}
+
+
+def new_action_summary(runs=0, seconds=0):
+    """
+    Returns the empty summary of an action for CallProfile.report().
+    """
+    return {"runs": runs, "seconds": round(seconds, 3), "requests": 0,
+            "retries": 0, "refused": 0, "errors": 0, "api_requests": {},
+            "calls": 0, "bytes": 0, "backend_seconds": 0, "methods": {}}
+
+
+def latency_summary(latencies):
+    """
+    Returns the total time and the latency percentiles of a list of
+    latencies in seconds, all 0 if there are none.
+    """
+    latencies = sorted(latencies)
+    summary = {"seconds": round(sum(latencies), 3)}
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}_ms"] = round(
+            1000 * nearest_rank(latencies, percentile), 1) if latencies else 0
+    summary["max_ms"] = round(1000 * latencies[-1], 1) if latencies else 0
+    return summary
+
+
+PROFILE = CallProfile()
+storage.observe_requests(PROFILE.record_request)
+
+
+class InstrumentedBackend(storage.StorageBackend):
+    """
+    Passes every call on to another backend, recording it in a
+    CallProfile.
+    """
+
+    def __init__(self, backend, profile=PROFILE):
+        self.backend = backend
+        self.profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def timed(self, method, size, *args):
+        """
+        Calls a method of the wrapped backend and records it.
+        Args:
+            method - string name of the method, size - function
+            returning the bytes carried given the result, args - the
+            arguments of the method.
+        Returns:
+            the result of the method.
+        """
+        start = time.perf_counter()
+        with self.profile.calling(method):
+            result = getattr(self.backend, method)(*args)
+        seconds = time.perf_counter() - start
+        self.profile.record(method, seconds, size(result))
+        return result
+
+    def get_all_values(self, worksheet):
+        return self.timed("get_all_values", payload_size, worksheet)
+
+    def get_worksheets(self, worksheets):
+        return self.timed("get_worksheets", payload_size, worksheets)
+
+    def row_values(self, worksheet, row_no):
+        return self.timed("row_values", payload_size, worksheet, row_no)
+
+    def col_values(self, worksheet, col_no):
+        return self.timed("col_values", payload_size, worksheet, col_no)
+
+    def get_column_spans(self, worksheet, spans):
+        return self.timed("get_column_spans", payload_size, worksheet, spans)
+
+    def write_cells(self, updates):
+        return self.timed("write_cells",
+                          lambda result: payload_size(
+                              [values for *cell, values in updates]),
+                          updates)
+
+    def after_fork(self):
+        self.backend.after_fork()
+
+
+def payload_size(values):
+    """
+    Returns the number of bytes of the values in nested lists, or in
+    a dictionary of them, when encoded as UTF-8, as an estimate of the
+    data sent or received.
+    """
+    if isinstance(values, dict):
+        return payload_size(list(values.values()))
+    if isinstance(values, (list, tuple)):
+        return sum(payload_size(value) for value in values)
+    if values is None:
+        return 0
+    return len(str(values).encode())
+
+
+def nearest_rank(values, percentile):
+    """
+    Returns the nearest-rank percentile of a sorted list of values.
+    """
+    rank = max(1, -(-percentile * len(values) // 100))
+    return values[rank - 1]
+
+
+def print_report(report):
+    """
+    Prints the profile of a session with one line per action, one
+    indented line per API request it sent and one per backend method it
+    called, followed by the API requests sent by that method.
+    """
+    print(f"\nProfile of the session started {report['started']}"
+          f" ({report['seconds']:.1f} s)\n")
+    for action, summary in report["actions"].items():
+        print(f"{action}: {summary['runs']} runs,"
+              f" {summary['requests']} API requests"
+              f" ({summary['retries']} retries, {summary['refused']}"
+              f" refused), {summary['calls']} backend calls,"
+              f" {summary['bytes']} bytes,"
+              f" {summary['backend_seconds']:.3f} s in the backend")
+        for request, stats in summary["api_requests"].items():
+            print(f"    {request}: {stats['requests']} requests,"
+                  f" {stats['retries']} retries, {stats['refused']} refused,"
+                  f" {latency_text(stats)}")
+        for method, stats in summary["methods"].items():
+            print(f"    backend {method}: {stats['calls']} calls,"
+                  f" {stats['bytes']} bytes, {latency_text(stats)}")
+            for request, count in stats["requests"].items():
+                print(f"        {request}: {count} requests")
+    if "cache" in report:
+        cache = report["cache"]
+        print(f"\nSnapshot cache: {cache['hits']} hits,"
+              f" {cache['misses']} misses")
+
+
+def latency_text(stats):
+    """
+    Returns the latency percentiles of a summary as text.
+    """
+    percentiles = ", ".join(f"p{percentile} {stats[f'p{percentile}_ms']} ms"
+                            for percentile in PERCENTILES)
+    return f"{percentiles}, max {stats['max_ms']} ms"
+
+
+def write_report(report, target=None):
+    """
+    Prints the report or appends it to a JSON lines file, as selected
+    by REDEPLOYMENT_PROFILE. Nothing is written if it is not set.
+    Args:
+        report - dictionary from CallProfile.report(),
+        target - "print" or a file name, REDEPLOYMENT_PROFILE if None.
+    """
+    target = PROFILE_TARGET if target is None else target
+    if not target:
+        return
+    if target == "print":
+        print_report(report)
+        return
+    with open(target, "a", encoding="utf-8") as profile_file:
+        profile_file.write(json.dumps(report) + "\n")
@@ -1,28 +1,690 @@
 # Import additional libraries to utilise functionality.
-import gspread
-from google.oauth2.service_account import Credentials
+# pandas and IPython are imported inside the functions using them and
+# gspread when connecting, so the first menu is not kept waiting.
 from InquirerPy import prompt
-from datetime import datetime
-import pandas as pd
-from IPython.display import display
+import bisect
+from dataclasses import dataclass
+from datetime import date, datetime
+import heapq
+import threading
+import time
+from typing import Union
 from prompt_toolkit import __version__ as ptk_version
+from prompt_toolkit.completion import Completer, Completion
+import journal
+import profiling
+import storage
 
 PTK3 = ptk_version.startswith('3.')
 
-# Setup the scope and credentials for
-# accessing google sheets. This was created as per the
-# Code Institute Love Sandwiches project.
+# Connect to the storage backend holding the worksheets. This is the
+# Google Sheets workbook unless REDEPLOYMENT_STORAGE selects sqlite.
+# The connection is made in the background while the main menu is
+# shown, or on the first data access if that comes first. Its calls
+# are recorded in profiling.PROFILE, and writes are queued in a local
+# journal and saved in the background. When the session ends, the
+# queued writes are waited for up to JOURNAL_EXIT_TIMEOUT seconds.
 
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-    ]
+BACKEND = None
+BACKEND_LOCK = threading.Lock()
+JOURNAL_EXIT_TIMEOUT = 30
+
+
+def backend():
+    """
+    Returns the storage backend, connecting to it on first use. If the
+    background connection is in progress, waits for it to finish.
+    Returns:
+        storage.StorageBackend.
+    """
+    global BACKEND
+    if BACKEND is None:
+        with BACKEND_LOCK:
+            if BACKEND is None:
+                BACKEND = journal.JournalledBackend(
+                    profiling.InstrumentedBackend(storage.connect_backend()))
+    return BACKEND
+
+
+def warm_up():
+    """
+    Connects to the storage backend and imports pandas. Any error is
+    left to be raised again on the first data access, where the user
+    will see it.
+    """
+    try:
+        backend()
+        import pandas  # noqa: F401
+    except Exception:
+        pass
+
+
+def save_pending_changes():
+    """
+    Waits for the writes still queued in the journal to be saved. If
+    the backend cannot be reached in time, they stay in the journal
+    and are saved when the application next starts. The user may
+    have closed the session already, so the writes are waited for
+    even if the messages cannot be shown.
+    """
+    if BACKEND is None:
+        return
+    if BACKEND.pending_count():
+        tell_user("Saving your changes...")
+        if BACKEND.drain(JOURNAL_EXIT_TIMEOUT):
+            tell_user("All changes have been saved.")
+    if not BACKEND.pending_count():
+        BACKEND.close()
+    else:
+        tell_user("Some changes could not be saved yet. They are kept on"
+                  " this computer and will be saved when the application"
+                  " next starts.")
+
+
+def tell_user(message):
+    """
+    Prints a message, unless the terminal or the session connection is
+    already closed.
+    """
+    try:
+        print(message)
+    except OSError:
+        pass
+
+
+def connect_in_background():
+    """
+    Starts warm_up() in a background thread so that authentication
+    happens while the user reads the main menu.
+    """
+    threading.Thread(target=warm_up, daemon=True).start()
+
+
+# The columns captured for a new employee, up to the entry date.
+
+IMPORT_HEADERS = storage.WORKSHEET_HEADERS["redeployment_pool"][:11]
+
+# The captured columns written as numbers. Every other value is written
+# as text exactly as captured.
+
+NUMBER_HEADERS = ["Age", "Salary", "Tenure -years", "Tenure -months"]
+
+# The below code keeps one snapshot of each worksheet so that the
+# functions reading the data share a single download per worksheet.
+# Snapshots expire after SNAPSHOT_TTL seconds and are invalidated
+# whenever the application writes to the worksheet. The version of a
+# worksheet changes with every read from it and every invalidation,
+# so results derived from its data can be cached by the version.
+
+SNAPSHOT_TTL = 60
+SNAPSHOT_CACHE = {}
+SNAPSHOT_STATS = {"hits": 0, "misses": 0}
+SNAPSHOT_VERSIONS = {}
+HEADER_INDEX = {}
+EMPLOYEE_INDEX = {}
+
+
+def cached_values(worksheet, key):
+    """
+    Returns a cached read result if it is younger than SNAPSHOT_TTL
+    seconds, without reading the worksheet.
+    Args:
+        worksheet - string name of worksheet, key - what was read.
+    Returns:
+        the cached result or None.
+    """
+    entry = SNAPSHOT_CACHE.get((worksheet, key))
+    if entry is not None and time.monotonic() - entry["time"] < SNAPSHOT_TTL:
+        return entry["values"]
+    return None
+
+
+def cached_read(worksheet, key, loader):
+    """
+    Returns the result of a read from the snapshot cache. The loader
+    is only called when the cached result is missing or expired.
+    Args:
+        worksheet - string name of worksheet, key - what is read,
+        loader - function performing the read.
+    Returns:
+        the result of the read, which must not be modified.
+    """
+    values = cached_values(worksheet, key)
+    if values is not None:
+        SNAPSHOT_STATS["hits"] += 1
+        return values
+    SNAPSHOT_STATS["misses"] += 1
+    values = loader()
+    SNAPSHOT_CACHE[(worksheet, key)] = {"values": values,
+                                        "time": time.monotonic()}
+    SNAPSHOT_VERSIONS[worksheet] = SNAPSHOT_VERSIONS.get(worksheet, 0) + 1
+    return values
+
+
+def fetch_snapshot(worksheet):
+    """
+    Returns all values of the worksheet from the snapshot cache.
+    The worksheet is only downloaded when there is no snapshot or
+    the snapshot is older than SNAPSHOT_TTL seconds.
+    The returned rows are shared and must not be modified.
+    Args:
+        worksheet - string name of worksheet.
+    Returns:
+        list of rows, the first row being the headers.
+    """
+    return cached_read(worksheet, "all", lambda: index_snapshot(
+        worksheet, backend().get_all_values(worksheet)))
+
+
+def fetch_snapshots(worksheets):
+    """
+    Returns all values of several worksheets from the snapshot cache.
+    The worksheets without a fresh snapshot are downloaded together
+    in one request, so reading them takes a single round trip.
+    Args:
+        worksheets - list of string names of worksheets.
+    Returns:
+        dictionary of worksheet name to list of rows, the first row
+        being the headers.
+    """
+    missing = [worksheet for worksheet in worksheets
+               if cached_values(worksheet, "all") is None]
+    downloaded = {}
+    if len(missing) > 1:
+        downloaded = backend().get_worksheets(missing)
+    snapshots = {}
+    for worksheet in worksheets:
+        if worksheet in downloaded:
+            snapshots[worksheet] = cached_read(
+                worksheet, "all",
+                lambda worksheet=worksheet: index_snapshot(
+                    worksheet, downloaded[worksheet]))
+        else:
+            snapshots[worksheet] = fetch_snapshot(worksheet)
+    return snapshots
+
+
+def index_snapshot(worksheet, values):
+    """
+    Checks the header index and rebuilds the employee index of a
+    worksheet from its newly downloaded values.
+    Args:
+        worksheet - string name of worksheet, values - list of rows.
+    Returns:
+        the values.
+    """
+    if values:
+        check_header_index(worksheet, values[0])
+        build_employee_index(worksheet, values)
+    return values
+
+
+def snapshot_version(worksheet):
+    """
+    Returns the version of the current snapshot of the worksheet,
+    fetching the snapshot if it is missing or expired.
+    Args:
+        worksheet - string name of worksheet.
+    Returns:
+        integer version.
+    """
+    fetch_snapshot(worksheet)
+    return SNAPSHOT_VERSIONS[worksheet]
+
+
+def fetch_columns(worksheet, headers):
+    """
+    Returns only the given columns of the worksheet. They are taken
+    from the full snapshot if it is cached, otherwise adjacent columns
+    are grouped into as few ranges as possible, e.g. A:C and N:N, and
+    read in a single request.
+    Args:
+        worksheet - string name of worksheet, headers - list of column
+        headers.
+    Returns:
+        list of rows holding the given columns in order, the first row
+        being the headers.
+    """
+    col_nos = [column_index(worksheet, header) for header in headers]
+    values = cached_values(worksheet, "all")
+    if values is None:
+        spans = []
+        for col_no in sorted(set(col_nos)):
+            if spans and spans[-1][1] == col_no - 1:
+                spans[-1] = (spans[-1][0], col_no)
+            else:
+                spans.append((col_no, col_no))
+
+        def load():
+            rows = []
+            for (first, last), block in zip(
+                    spans, backend().get_column_spans(worksheet, spans)):
+                while len(rows) < len(block):
+                    rows.append({})
+                for row, row_values in zip(rows, block):
+                    row.update(zip(range(first, last + 1), row_values))
+            return rows
+
+        rows = cached_read(worksheet, ("columns", tuple(spans)), load)
+        return [[row.get(col_no, "") for col_no in col_nos] for row in rows]
+    return [[row[col_no - 1] if len(row) >= col_no else ""
+             for col_no in col_nos] for row in values]
+
+
+def invalidate_snapshot(worksheet):
+    """
+    Discards everything cached from a worksheet after it has been
+    written to, so that the next read fetches the new data.
+    Args:
+        worksheet - string name of worksheet.
+    """
+    for key in [key for key in SNAPSHOT_CACHE if key[0] == worksheet]:
+        del SNAPSHOT_CACHE[key]
+    SNAPSHOT_VERSIONS[worksheet] = SNAPSHOT_VERSIONS.get(worksheet, 0) + 1
+
+
+def build_header_index(worksheet, headers):
+    """
+    Builds the header to column number map of a worksheet and
+    stores it in HEADER_INDEX.
+    Args:
+        worksheet - string name of worksheet, headers - list of the
+        values in row 1.
+    Returns:
+        dictionary of header to column number (starting at 1).
+    """
+    index = {}
+    for col_no, header in enumerate(headers, start=1):
+        if header and header not in index:
+            index[header] = col_no
+    HEADER_INDEX[worksheet] = {"headers": list(headers), "columns": index}
+    return index
+
+
+def check_header_index(worksheet, headers):
+    """
+    Compares the cached header index with the header row of a newly
+    downloaded snapshot and rebuilds the index if the columns moved.
+    Args:
+        worksheet - string name of worksheet, headers - list of the
+        values in row 1.
+    """
+    cached = HEADER_INDEX.get(worksheet)
+    if cached is None or cached["headers"] != list(headers):
+        build_header_index(worksheet, headers)
+
+
+def header_row(worksheet):
+    """
+    Returns the headers of a worksheet. Only row 1 is read, once per
+    worksheet, and kept in HEADER_INDEX.
+    Args:
+        worksheet - string name of worksheet.
+    Returns:
+        list of the headers, which must not be modified.
+    """
+    if worksheet not in HEADER_INDEX:
+        build_header_index(worksheet, backend().row_values(worksheet, 1))
+    return HEADER_INDEX[worksheet]["headers"]
+
+
+def column_index(worksheet, header):
+    """
+    Returns the column number of a header. Only the header row is
+    consulted, so that a data cell holding the same text as a header
+    can never be mistaken for the header.
+    Args:
+        worksheet - string name of worksheet, header - string column
+        header.
+    Returns:
+        integer column number.
+    Raises:
+        ValueError if the header does not exist in the worksheet.
+    """
+    header_row(worksheet)
+    columns = HEADER_INDEX[worksheet]["columns"]
+    if header not in columns:
+        raise ValueError(f"{header} is not a column of {worksheet}")
+    return columns[header]
+
+
+def build_employee_index(worksheet, values=None):
+    """
+    Builds the employee number to row number map of a worksheet.
+    Only the Emp Number column is read, unless the rows of a freshly
+    downloaded snapshot are provided, in which case no call is made.
+    Args:
+        worksheet - string name of worksheet, values - optional list
+        of all rows including the headers.
+    Returns:
+        dictionary holding the row map and the time it was built.
+    """
+    col_no = column_index(worksheet, "Emp Number")
+    if values is None:
+        emp_numbers = backend().col_values(worksheet, col_no)
+    else:
+        emp_numbers = [row[col_no - 1] if len(row) >= col_no else ""
+                       for row in values]
+        while emp_numbers and emp_numbers[-1] == "":
+            emp_numbers.pop()
+    rows = {}
+    for row_no, emp_number in enumerate(emp_numbers[1:], start=2):
+        if emp_number and emp_number not in rows:
+            rows[emp_number] = row_no
+    index = {"rows": rows, "time": time.monotonic()}
+    EMPLOYEE_INDEX[worksheet] = index
+    return index
+
+
+def employee_row(worksheet, emp_value):
+    """
+    Returns the row number of an employee from the employee index.
+    The index is rebuilt once if the number is missing, in case
+    another session has added the employee since it was built.
+    Args:
+        worksheet - string name of worksheet,
+        emp_value - string employee number.
+    Returns:
+        integer row number.
+    Raises:
+        ValueError if the employee number does not exist in the worksheet.
+    """
+    index = EMPLOYEE_INDEX.get(worksheet)
+    if index is None or emp_value not in index["rows"]:
+        index = build_employee_index(worksheet)
+    if emp_value not in index["rows"]:
+        raise ValueError(f"employee number {emp_value} was not found"
+                         f" in {worksheet}")
+    return index["rows"][emp_value]
+
+
+def fetch_row(worksheet, emp_value):
+    """
+    Returns the row number and the values of an employee. The row is
+    taken from the full snapshot if it is cached, otherwise only that
+    row is read. The employee index is rebuilt and the read repeated
+    once if the row does not hold the employee, for example after
+    another session wrote.
+    Args:
+        worksheet - string name of worksheet,
+        emp_value - string employee number.
+    Returns:
+        tuple of the integer row number and the list of row values.
+    Raises:
+        ValueError if the employee number does not exist in the worksheet.
+    """
+    emp_col = column_index(worksheet, "Emp Number")
+    width = len(header_row(worksheet))
+    for attempt in range(2):
+        row_no = employee_row(worksheet, emp_value)
+        values = cached_values(worksheet, "all")
+        if values is not None:
+            row = values[row_no - 1] if row_no <= len(values) else []
+        else:
+            row = cached_read(worksheet, ("row", row_no),
+                              lambda: backend().row_values(worksheet, row_no))
+        if len(row) >= emp_col and row[emp_col - 1] == emp_value:
+            return row_no, list(row) + [""] * (width - len(row))
+        invalidate_snapshot(worksheet)
+        build_employee_index(worksheet)
+    raise ValueError(f"employee number {emp_value} was not found"
+                     f" in {worksheet}")
+
+
+def employee_index(worksheet):
+    """
+    Returns the employee index of a worksheet, loading it the first
+    time it is needed. The index is refreshed from the Emp Number
+    column once it is older than SNAPSHOT_TTL seconds, to pick up
+    employees added by other sessions.
+    Args:
+        worksheet - string name of worksheet.
+    Returns:
+        dictionary holding the row map and the time it was built.
+    """
+    index = EMPLOYEE_INDEX.get(worksheet)
+    if index is None or time.monotonic() - index["time"] >= SNAPSHOT_TTL:
+        index = build_employee_index(worksheet)
+    return index
+
+
+def employee_numbers(worksheet):
+    """
+    Returns the employee numbers of a worksheet as a set-like view of
+    the employee index, so a membership test costs no API call.
+    Args:
+        worksheet - string name of worksheet.
+    Returns:
+        the keys of the employee index row map.
+    """
+    return employee_index(worksheet)["rows"].keys()
+
+
+def write_rows(updates):
+    """
+    Writes one or more runs of values to the worksheets as a single
+    transaction and keeps the caches in step with the write. Updates
+    with no row number append a new row. Its row number is added to
+    the employee index if the backend returns it. While the write is
+    still queued it is not known, so the index is built again on next
+    use, from the rows as the journal shows them.
+    Args:
+        updates - list of (worksheet, row, column number, list of
+        values) tuples, where the row is a number, None for a new row
+        or the row_reference() of an employee.
+    """
+    with PREFETCH_LOCK:
+        rows = backend().write_cells(updates) or [None] * len(updates)
+        for (worksheet, row_no, col_no, values), written in zip(updates,
+                                                                rows):
+            index = EMPLOYEE_INDEX.get(worksheet)
+            if index is not None and row_no is None:
+                if written is None:
+                    del EMPLOYEE_INDEX[worksheet]
+                else:
+                    emp_col = column_index(worksheet, "Emp Number")
+                    index["rows"].setdefault(str(values[emp_col - col_no]),
+                                             written)
+            invalidate_snapshot(worksheet)
+
+
+def row_reference(worksheet, emp_value, row_no):
+    """
+    Returns the row to write the changes of an employee to. The row
+    of an employee added in this session is only known for sure once
+    the journal has sent the append, so its changes give the journal
+    the employee number to look the row up by when they are sent.
+    Args:
+        worksheet - string name of worksheet,
+        emp_value - string employee number,
+        row_no - integer row the employee was read from.
+    Returns:
+        the row number, or the journal key of the employee.
+    """
+    if backend().appends_employee(worksheet, emp_value):
+        return journal.employee_key(emp_value)
+    return row_no
+
+
+def snapshot_statistics():
+    """
+    Returns the snapshot cache hit and miss counters.
+    Returns:
+        dictionary with the hits, misses and hit ratio.
+    """
+    total = SNAPSHOT_STATS["hits"] + SNAPSHOT_STATS["misses"]
+    ratio = SNAPSHOT_STATS["hits"] / total if total else 0.0
+    return {"hits": SNAPSHOT_STATS["hits"],
+            "misses": SNAPSHOT_STATS["misses"],
+            "hit_ratio": round(ratio, 3)}
+
+
+# The below code validates data, either a single value captured by
+# the user or a whole column of an imported file, with the same rules.
+# Each check returns a ValidationError for every invalid value.
+
+AGE_RANGE = range(18, 76, 1)
+SALARY_RANGE = range(100, 100001, 1)
+YEAR_RANGE = range(1, 51, 1)
+MONTH_RANGE = range(1, 11, 1)
+GENDERS = ["male", "female", "unknown"]
+INTEGER_PATTERN = r"\s*[+-]?\d+\s*"
+
+
+@dataclass
+class ValidationError:
+    """
+    A value that failed validation. The row is the index label of the
+    value within the checked series.
+    """
+    row: int
+    field: str
+    value: str
+    message: str
+
+
+def as_series(values):
+    """
+    Converts a single value, a list or a series into a series of strings.
+    """
+    import pandas as pd
+
+    if isinstance(values, str):
+        values = [values]
+    return pd.Series(values, dtype=object).astype(str)
+
+
+def collect_errors(values, mask, field, message):
+    """
+    Creates a ValidationError for every value selected by the mask.
+    Args:
+        values - series of strings, mask - boolean series,
+        field - string column name, message - string which may refer to
+        {value} and {length}.
+    Returns:
+        list of ValidationError.
+    """
+    return [ValidationError(row, field, value,
+                            message.format(value=value, length=len(value)))
+            for row, value in values[mask].items()]
+
+
+def check_numbers(values, existing=(), field="Emp Number"):
+    """
+    Checks that employee numbers are 6 digit numbers which are neither
+    in the existing employee numbers nor repeated within the values.
+    Args:
+        values - the numbers to check, existing - set or dictionary keys
+        of the employee numbers already saved, field - string column name.
+    Returns:
+        list of ValidationError.
+    """
+    values = as_series(values)
+    is_number = values.str.fullmatch(INTEGER_PATTERN)
+    wrong_length = is_number & (values.str.len() != 6)
+    valid = is_number & ~wrong_length
+    message = "Only a unique 6 digit number is accepted, you entered "
+    errors = collect_errors(values, ~is_number, field, message + "{value}")
+    errors += collect_errors(values, wrong_length, field,
+                             message + "{length} digits")
+    saved = values.map(lambda value: value in existing).astype(bool)
+    errors += collect_errors(values, valid & saved, field,
+                             message + "the duplicate employee number"
+                             " {value}")
+    errors += collect_errors(values, valid & ~saved
+                             & values.duplicated(keep="first"), field,
+                             message + "the repeated employee number"
+                             " {value}")
+    return sorted(errors, key=lambda error: error.row)
+
+
+def check_text(values, field):
+    """
+    Checks that the values are not numbers.
+    Args:
+        values - the values to check, field - string column name.
+    Returns:
+        list of ValidationError.
+    """
+    values = as_series(values)
+    return collect_errors(values, values.str.isnumeric(), field,
+                          "Numbers are not accepted, you entered {value}")
+
+
+def check_range(values, field, given_range, range_text):
+    """
+    Checks that the values are whole numbers within the given range.
+    Args:
+        values - the values to check, field - string column name,
+        given_range - the relevant number range, range_text - string
+        describing the range.
+    Returns:
+        list of ValidationError.
+    """
+    import pandas as pd
+
+    values = as_series(values)
+    numbers = pd.to_numeric(values.where(
+        values.str.fullmatch(INTEGER_PATTERN)), errors="coerce")
+    in_range = ((numbers >= given_range.start) & (numbers < given_range.stop)
+                & ((numbers - given_range.start) % given_range.step == 0))
+    return collect_errors(values, ~in_range, field,
+                          f"Only a value between {range_text} is accepted,"
+                          " you entered {value}")
+
+
+def check_choice(values, field, choices):
+    """
+    Checks that the values are one of the given choices.
+    Args:
+        values - the values to check, field - string column name,
+        choices - list of the accepted strings.
+    Returns:
+        list of ValidationError.
+    """
+    values = as_series(values)
+    return collect_errors(values, ~values.isin(choices), field,
+                          f"Only {', '.join(choices)} is accepted,"
+                          " you entered {value}")
+
+
+def check_dates(values, field="Entry Date"):
+    """
+    Checks that the values are dates in the format DD/MM/YYYY which
+    occur before today. Each value is parsed only once.
+    Args:
+        values - the values to check, field - string column name.
+    Returns:
+        list of ValidationError.
+    References:
+        The following article was referenced to convert to date:
+        https://stackoverflow.com/questions/52260789/update-googlesheet-cell-with-timestamp-from-python
+    """
+    import pandas as pd
+
+    values = as_series(values)
+    dates = pd.to_datetime(values, format="%d/%m/%Y", errors="coerce")
+    message = ("The date format should be DD/MM/YYYY and it should occur"
+               " before today's date, you entered {value}")
+    errors = collect_errors(values, dates.isna(), field, message)
+    errors += collect_errors(values, dates >= pd.Timestamp(
+        datetime.today().date()), field,
+        message + " which is equal to or occurs after today.")
+    return sorted(errors, key=lambda error: error.row)
+
+
+def report_errors(errors):
+    """
+    Prints the validation errors of a value captured by the user.
+    Args:
+        errors - list of ValidationError.
+    Returns:
+        True, the input is valid or False, the input is not valid.
+    """
+    for error in errors:
+        print(f"{error.message}, please try again.\n")
+    return not errors
 
-CREDS = Credentials.from_service_account_file("creds.json")
-SCOPED_CREDS = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
-SHEET = GSPREAD_CLIENT.open("redeployment_report")
 
 # The below code is utilised to perform the action of adding a
 # new employee to the redeployment pool.
@@ -60,37 +722,19 @@ def get_employee_number():
 
 def validate_number(value):
     """
-    Inside the try, converts string value into integer.
+    Checks the employee number with check_numbers() against the
+    cached employee numbers in the redeployment pool.
     Args:
         value - string entered by the user.
     Returns:
         True, the input is valid or False, the input is not valid.
-    Raises:
-        ValueError if string cannot be converted into int,
-        or if there aren't exactly 6 values. The second validation checks
-        if the string exists in the employee list from the redeployment pool,
-        if it does the user is notified to enter a unique value.
     References:
         This function was created based on the validate_data(values) function
         created in the Code Institute Love Sandwiches project. It has been
         adjusted to align with this application's requirements.
     """
-    try:
-        int(value)
-        if len(value) != 6:
-            raise ValueError(
-                f"{len(value)} digits"
-            )
-        employees = retrieve_dataset_employee("redeployment_pool",
-                                              "Emp Number")
-        if value in employees:
-            raise ValueError(f"the duplicate employee number {value}")
-    except ValueError as e:
-        print(f"Only a unique 6 digit number is accepted, you entered {e},"
-              " please try again.\n")
-        return False
-
-    return True
+    employees = employee_numbers("redeployment_pool")
+    return report_errors(check_numbers(value, employees))
 
 
 def get_input(name):
@@ -119,24 +763,13 @@ def get_input(name):
 
 def validate_data(value):
     """
-    Inside the try, checks if the string is numeric.
+    Checks with check_text() that the string is not numeric.
     Args:
         value - string captured by user.
     Returns:
         True, the input is valid or False, the input is not valid.
-    Raises:
-        ValueError if strings is numeric.
-
     """
-    try:
-        if value.isnumeric() is True:
-            raise ValueError(f"{value}")
-    except ValueError as e:
-        print(f"Numbers are not accepted, you entered {e},"
-              " please try again.\n")
-        return False
-
-    return True
+    return report_errors(check_text(value, "text"))
 
 
 def get_number(title, number, range, given_range):
@@ -166,28 +799,14 @@ def get_number(title, number, range, given_range):
 
 def validate_range(number, range, given_range):
     """
-    Inside the try, converts string value into integer.
+    Checks with check_range() that the number is within the range.
     Args:
         number - string, range - string,
         given_range - the relevant number range.
-    Raises:
-        ValueError if strings cannot be converted into int,
-        or if value is not between the given range.
-
+    Returns:
+        True, the input is valid or False, the input is not valid.
     """
-    try:
-        given_range
-        number = int(number)
-        if number not in given_range:
-            raise ValueError(
-                f"{number}"
-            )
-    except ValueError as e:
-        print(f"Only a value between {range} is accepted, you entered {e},"
-              " please try again.\n")
-        return False
-
-    return True
+    return report_errors(check_range(number, "number", given_range, range))
 
 
 def get_gender():
@@ -201,7 +820,7 @@ def get_gender():
     while True:
         gender = [{"type": "list",
                    "message": "Please select the employee's gender",
-                   "choices": ["male", "female", "unknown"], }, ]
+                   "choices": GENDERS, }, ]
         result = prompt(gender)
         name = result[0]
         print("Valid gender selected \n")
@@ -238,42 +857,21 @@ def get_date():
 
 def validate_date(my_str_date):
     """
-    Validates the format of the input as a date.
+    Checks with check_dates() that the input is a date in the format
+    DD/MM/YYYY which occurs before today.
     Args:
         my_str_date - string captured by user
     Returns:
         True, the input is valid or False, the input is not valid.
-    Raises:
-        ValueError if string cannot be converted into a date and
-        if it is in the incorrect format.
-        ValueError if the captured_date is greater than or equal to
-        today's date.
-    References:
-        The following article was referenced to convert to date:
-        https://stackoverflow.com/questions/52260789/update-googlesheet-cell-with-timestamp-from-python
     """
-    try:
-        captured_date = datetime.strptime(my_str_date, "%d/%m/%Y")
-        if captured_date.date() >= datetime.today().date():
-            raise ValueError(f"{my_str_date} which is equal to"
-                             " or occurs after today.")
-        elif datetime.strptime(my_str_date, "%d/%m/%Y"):
-            return datetime.strptime(my_str_date, "%d/%m/%Y")
-        else:
-            raise ValueError(f"{my_str_date}")
-    except ValueError as e:
-        print(f"The date format should be DD/MM/YYYY"
-              f" and it should occur before today's date, you entered {e} ,"
-              " please try again.\n")
-        return False
-
-    return True
+    return report_errors(check_dates(my_str_date))
 
 
 def update_sheet(data, worksheet):
     """
     Receives a list of values to be inserted into a worksheet
     Updates the relevant worksheet with the data provided.
+    The row is appended below the last row in a single request.
     Args:
         data - list of user input, worksheet -string name of worksheet
     References:
@@ -282,8 +880,7 @@ def update_sheet(data, worksheet):
         It has been adjusted to align with this application's requirements.
     """
     print(f"Updating {worksheet} worksheet...\n")
-    worksheet_to_update = SHEET.worksheet(worksheet)
-    worksheet_to_update.append_row(data)
+    write_rows([(worksheet, None, 1, data)])
     print(f"{worksheet} worksheet updated successfully.\n")
 
 
@@ -292,40 +889,29 @@ def add_employee():
     Run all program functions to add an employee to the
     Redeployment Process and save the data to the redeployment pool
     worksheet.
-    References:
-    The following article was referenced to return a cell's address:
-    https://github.com/burnash/gspread/issues/41
+    The entry date is included in the row, so the employee is saved
+    with a single write.
     """
     print("Please proceed to add a new employee.\n")
-    age_range = range(18, 76, 1)
-    salary_range = range(100, 100001, 1)
-    year_range = range(1, 51, 1)
-    month_range = range(1, 11, 1)
     emp_number = get_employee_number()
     emp_name = get_input("first name")
     emp_surname = get_input("surname")
-    emp_age = get_number("age", "age", "18 to 75", age_range)
+    emp_age = get_number("age", "age", "18 to 75", AGE_RANGE)
     emp_gender = get_gender()
     emp_department = get_input("department")
     emp_position = get_input("position")
-    emp_salary = get_number("salary", "salary", "100 to 100 000", salary_range)
+    emp_salary = get_number("salary", "salary", "100 to 100 000", SALARY_RANGE)
     emp_years = get_number("years of service", "years of service",
-                           "1 to 50", year_range)
+                           "1 to 50", YEAR_RANGE)
     emp_months = get_number("months of service", "months of service",
-                            "1 to 11", month_range)
+                            "1 to 11", MONTH_RANGE)
     emp_date = get_date()
     employee = [emp_number, emp_name, emp_surname, emp_age,
                 emp_gender, emp_department, emp_position, emp_salary,
                 emp_years, emp_months,
-                " ", " ", " ", "Active"]
+                emp_date, " ", " ", "Active"]
     update_sheet(employee, "redeployment_pool")
-    sheet = SHEET.worksheet("redeployment_pool")
-    cell = sheet.find(emp_number)
-    row_no = "%s" % (cell.row)
-    cell_2 = sheet.find("Entry Date")
-    col_no = "%s" % (cell_2.col)
-    sheet.update_cell(row_no, col_no, emp_date)
-    main()
+    return main_menu
 
 
 # The below functions are used to select an employee and update data.
@@ -335,92 +921,382 @@ def retrieve_dataset(worksheet, columns_list):
     """
     Utilises pandas to return the worksheet to python.
     The employee list is utilised by the user to select
-    an employee.
+    an employee. Only the columns that are kept and the
+    Status column are read.
     Args:
         worksheet - string name of worksheet, columns_list -
         list of columns to omit
     Returns:
         columns combined and converted to a list of strings
     """
-    wks = SHEET.worksheet(worksheet)
-    data = wks.get_all_values()
-    headers = data.pop(0)
-    df = pd.DataFrame(data, columns=headers)
+    import pandas as pd
+
+    headers = header_row(worksheet)
+    kept = [header for position, header in enumerate(headers)
+            if position not in columns_list]
+    columns = [header for header in headers
+               if header in kept or header == "Status"]
+    data = fetch_columns(worksheet, columns)
+    df = pd.DataFrame(data[1:], columns=columns)
     df = df.loc[df["Status"] != "Placed"]
     df = df.loc[df["Status"] != "Retren."]
-    df = df.drop(df.columns[columns_list], axis=1)
+    df = df[kept]
     df["combined"] = df.values.tolist()
     employees = df["combined"].tolist()
     emp_list = list(map(" ".join, employees))
     return emp_list
 
 
-def retrieve_dataset_employee(worksheet, heading):
+def retrieve_headers():
     """
-    Utilises pandas to return the worksheet to python.
-    The employee list is utilised by the user to select
-    an employee.
-    Args:
-        worksheet - string name of worksheet, heading - to add employee
-        number only
+    Returns the headers of the redeployment pool, read from row 1
+    only. The headers are retrieved to create a picklist of
+    fields the user can choose to update.
     Returns:
-        list of all employee numbers
+        list of column headers
     """
-    wks = SHEET.worksheet(worksheet)
-    data = wks.get_all_values()
-    headers = data.pop(0)
-    df = pd.DataFrame(data, columns=headers)
-    identifier = df[heading]
-    employee_list = identifier.to_list()
-    return employee_list
+    headers = list(header_row("redeployment_pool"))
+    return(headers)
 
 
-def retrieve_headers():
+# The below code finds employees as the user types. The selectable
+# employees are indexed once per worksheet version by the words of
+# their number, name and surname, and by each part of a word joined
+# by hyphens or apostrophes, sorted for prefix search, and by the
+# trigrams of those words for misspelt searches. Terms shorter
+# than FUZZY_MIN_LENGTH letters are only matched as prefixes, and a
+# word matches a misspelt term when their trigrams overlap by at least
+# FUZZY_MIN_SIMILARITY of both, or when one typo or swap of adjacent
+# letters turns one into the other. Only the best SEARCH_LIMIT matches
+# are shown, however many employees there are.
+
+SEARCH_LIMIT = 10
+PREFIX_LIMIT = 200
+TRIGRAM_POSTING_LIMIT = 2000
+FUZZY_MIN_LENGTH = 4
+FUZZY_MIN_SIMILARITY = 0.5
+EMPLOYEE_SEARCH = {}
+
+
+def trigrams(word):
     """
-    Utilises pandas to return the worksheet to python.
-    The headers are retrieved to create a picklist of
-    fields the user can choose to update.
+    Returns the three letter sequences of a word padded with two spaces
+    in front and one behind, e.g. "  s", " sm", smi, mit, ith and "th "
+    for smith, so that the first and last letters of a word count.
+    """
+    padded = f"  {word} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def word_parts(word):
+    """
+    Returns the parts of a word joined by hyphens or apostrophes, e.g.
+    mary and ann for mary-ann and o and neil for o'neil, so that each
+    can be searched for on its own.
+    """
+    for separator in "-'\u2019":
+        word = word.replace(separator, " ")
+    return word.split()
+
+
+def edit_distance(first, second):
+    """
+    Returns the number of letters inserted, deleted, replaced or swapped
+    with the next one to turn one word into the other.
+    References:
+        Optimal string alignment distance:
+        https://en.wikipedia.org/wiki/Damerau%E2%80%93Levenshtein_distance
+    """
+    previous, current = None, list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before, previous = previous, current
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + cost)
+            if (i > 1 and j > 1 and first[i - 1] == second[j - 2]
+                    and first[i - 2] == second[j - 1]):
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+class EmployeeSearch:
+    """
+    Prefix and trigram index of the employees that can be selected,
+    each described by a label such as "100003 John Smith".
+    """
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.numbers = {}
+        self.trigrams = {}
+        self.trigram_counts = []
+        words = []
+        for position, label in enumerate(labels):
+            tokens = label.lower().split()
+            if tokens:
+                self.numbers.setdefault(tokens[0], position)
+            for token in set(tokens).union(*map(word_parts, tokens)):
+                word_trigrams = trigrams(token)
+                for trigram in word_trigrams:
+                    self.trigrams.setdefault(trigram, []).append(len(words))
+                self.trigram_counts.append(len(word_trigrams))
+                words.append((token, position))
+        self.tokens = list(words)
+        words.sort()
+        self.words = words
+        self.keys = [word for word, position in words]
+
+    def prefix_matches(self, term):
+        """
+        Returns the employees with a word starting with the term, scored
+        1 for a whole word and 0.8 for a prefix. At most PREFIX_LIMIT
+        words are looked at.
+        """
+        matches = {}
+        start = bisect.bisect_left(self.keys, term)
+        for word, position in self.words[start:start + PREFIX_LIMIT]:
+            if not word.startswith(term):
+                break
+            score = 1.0 if word == term else 0.8
+            matches[position] = max(matches.get(position, 0), score)
+        return matches
+
+    def fuzzy_matches(self, term):
+        """
+        Returns the employees with a word similar to the term, scored up
+        to 0.6 by their similarity. The similarity is the share of the
+        trigrams of both the term and the word they have in common, or,
+        for a word one typo or swap away from the term, the share of
+        its letters that are right. Terms shorter than FUZZY_MIN_LENGTH
+        are not matched, and trigrams found in more than
+        TRIGRAM_POSTING_LIMIT words are too common to tell them apart
+        and are skipped.
+        """
+        if len(term) < FUZZY_MIN_LENGTH:
+            return {}
+        term_trigrams = trigrams(term)
+        counts = {}
+        for trigram in term_trigrams:
+            postings = self.trigrams.get(trigram, [])
+            if len(postings) > TRIGRAM_POSTING_LIMIT:
+                continue
+            for word_id in postings:
+                counts[word_id] = counts.get(word_id, 0) + 1
+        matches = {}
+        for word_id, count in counts.items():
+            word, position = self.tokens[word_id]
+            similarity = 2 * count / (len(term_trigrams)
+                                      + self.trigram_counts[word_id])
+            if (similarity < FUZZY_MIN_SIMILARITY
+                    and abs(len(word) - len(term)) <= 1
+                    and edit_distance(term, word) == 1):
+                similarity = 1 - 1 / max(len(word), len(term))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches[position] = max(matches.get(position, 0),
+                                        0.6 * similarity)
+        return matches
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """
+        Finds the employees best matching every word of the text.
+        Args:
+            text - string typed by the user, limit - integer number of
+            matches to return.
+        Returns:
+            list of labels, best match first.
+        """
+        scores = {}
+        for term in text.lower().split():
+            matches = self.fuzzy_matches(term)
+            for position, score in self.prefix_matches(term).items():
+                matches[position] = max(matches.get(position, 0), score)
+            for position, score in matches.items():
+                scores[position] = scores.get(position, 0) + score
+        best = heapq.nlargest(limit, scores,
+                              key=lambda position: (scores[position],
+                                                    -position))
+        return [self.labels[position] for position in best]
+
+    def find(self, text):
+        """
+        Returns the label of the employee whose number the text starts
+        with, as when a suggestion has been accepted, or None.
+        """
+        tokens = text.lower().split()
+        if tokens and tokens[0] in self.numbers:
+            return self.labels[self.numbers[tokens[0]]]
+        return None
+
+
+class EmployeeCompleter(Completer):
+    """
+    Suggests the best matching employees while the user types.
+    """
+
+    def __init__(self, search):
+        self.search = search
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        if not text.strip():
+            return
+        for label in self.search.search(text):
+            yield Completion(label, start_position=-len(text))
+
+
+def employee_search(worksheet):
+    """
+    Returns the search index of the employees that can be selected,
+    rebuilding it only when the worksheet has been read or written
+    since, or after SNAPSHOT_TTL seconds.
+    Args:
+        worksheet - string name of worksheet.
     Returns:
-        list of column headers
+        EmployeeSearch.
     """
-    wks = SHEET.worksheet("redeployment_pool")
-    data = wks.get_all_values()
-    headers = data.pop(0)
-    return(headers)
+    cached = EMPLOYEE_SEARCH.get(worksheet)
+    if (cached is None
+            or cached["version"] != SNAPSHOT_VERSIONS.get(worksheet)
+            or time.monotonic() - cached["time"] >= SNAPSHOT_TTL):
+        labels = retrieve_dataset(worksheet, [3, 4, 5, 6, 7, 8, 9, 10, 11,
+                                              12, 13])
+        cached = {"version": SNAPSHOT_VERSIONS.get(worksheet),
+                  "time": time.monotonic(),
+                  "search": EmployeeSearch(labels)}
+        EMPLOYEE_SEARCH[worksheet] = cached
+    return cached["search"]
 
 
 def select_employee():
     """
     Utilise the Employee Number, Name and Surname as the identifier to select
-    the row of data to update. Utilises inquirer functionality to
-    create and format the list.
+    the row of data to update. The user types part of the number, name
+    or surname and the best matches are suggested as they type. If the
+    text does not start with an employee number, the best matches are
+    listed to choose from.
     Returns:
         the employee number as a string.
     """
-    choices_list = retrieve_dataset("redeployment_pool", [3, 4, 5, 6, 7,
-                                    8, 9, 10, 11, 12, 13])
+    finish_prefetch()
+    search = employee_search("redeployment_pool")
     while True:
+        employee = [{"type": "input",
+                     "message": "Type the employee number, name or"
+                                " surname of the employee to update",
+                     "completer": EmployeeCompleter(search), }, ]
+        result = prompt(employee)
+        selected = search.find(result[0])
+        if selected is not None:
+            break
+        matches = search.search(result[0])
+        if not matches:
+            print(f"No employee matches {result[0]}, please try again.\n")
+            continue
         employee = [{"type": "list",
                      "message": "Please select the "
                      "employee to update",
-                     "choices": choices_list, }, ]
+                     "choices": matches + ["Search again"], }, ]
         result = prompt(employee)
-        print(f"You have selected {result} \n")
-        emp_values_name = result[0]
-        emp_values = emp_values_name.split()
-        emp_value = emp_values[0]
-        break
+        if result[0] != "Search again":
+            selected = result[0]
+            break
+    print(f"You have selected {selected} \n")
+    emp_values = selected.split()
+    emp_value = emp_values[0]
 
     return (emp_value)
 
 
+@dataclass
+class Employee:
+    """
+    One employee record of the redeployment pool worksheet. The numeric
+    fields are strings unless fetch_employee was asked to convert them.
+    """
+    row: int
+    emp_number: str
+    name: str
+    surname: str
+    age: Union[int, str]
+    gender: str
+    department: str
+    position: str
+    salary: Union[int, str]
+    tenure_years: Union[int, str]
+    tenure_months: Union[int, str]
+    entry_date: str
+    exit_date: str
+    days: str
+    status: str
+
+
+EMPLOYEE_FIELDS = {"emp_number": "Emp Number", "name": "Name",
+                   "surname": "Surname", "age": "Age", "gender": "Gender",
+                   "department": "Department", "position": "Position",
+                   "salary": "Salary", "tenure_years": "Tenure -years",
+                   "tenure_months": "Tenure -months",
+                   "entry_date": "Entry Date", "exit_date": "Exit Date",
+                   "days": "Days", "status": "Status"}
+
+
+def fetch_employee(emp_value, numbers=()):
+    """
+    Returns the full record of one employee from the redeployment pool.
+    The row is read from the cached snapshot, or on its own when there
+    is no snapshot, so the record costs at most one small read. Only
+    the fields the caller needs are converted to integers, so invalid
+    data in another field does not stop it.
+    Args:
+        emp_value - string employee number, numbers - names of the
+        Employee fields to convert to integers, e.g. ["salary"].
+    Returns:
+        Employee with the given fields converted to integers.
+    Raises:
+        ValueError if the employee number does not exist or one of the
+        given fields does not hold a whole number.
+    """
+    row_no, row = fetch_row("redeployment_pool", emp_value)
+    fields = {}
+    for field, header in EMPLOYEE_FIELDS.items():
+        col_no = column_index("redeployment_pool", header)
+        value = row[col_no - 1].strip() if len(row) >= col_no else ""
+        if field in numbers:
+            value = parse_whole_number(value, header)
+        fields[field] = value
+    return Employee(row=row_no, **fields)
+
+
+def parse_whole_number(value, header):
+    """
+    Converts a worksheet value to an integer. Thousands separators are
+    ignored, as when the worksheet is loaded by typed_frame(), so
+    5,000 is read as 5000.
+    Args:
+        value - string value, header - string header of its column.
+    Returns:
+        integer.
+    Raises:
+        ValueError if the value is not a whole number.
+    """
+    try:
+        number = float(value.strip().replace(",", ""))
+    except ValueError:
+        number = None
+    if number is None or not number.is_integer():
+        raise ValueError(f"the {header} '{value}' is not a whole number")
+    return int(number)
+
+
 def select_field():
     """
     Utilise the headers as the identifier to select
     the column of data to update. Utilises inquirer functionality to
-    create and format the list.
+    create and format the list, followed by the options to save or
+    discard the changes made so far.
     Returns:
-        the selected header as a string.
+        the selected header, "Save changes" or "Discard changes".
     References:
         the list.extend function was used as per
         the stackoverflow post:
@@ -431,7 +1307,7 @@ def select_field():
     options_list.extend([headers[1], headers[2], headers[3],
                         headers[4], headers[5], headers[6],
                         headers[7], headers[8], headers[9],
-                        headers[10]])
+                        headers[10], "Save changes", "Discard changes"])
     while True:
         heading_options = [{"type": "list",
                             "message": "Please select the "
@@ -448,14 +1324,14 @@ def select_field():
 def update_another_field():
     """
     Checks with the user if they would like to update
-    another field. User answers Yes or No
+    another employee. User answers Yes or No
     Returns:
         answer as a string
     """
     while True:
         yes_or_no = [{"type": "list",
                       "message": "Would you like to "
-                      "return to the update menu?",
+                      "update another employee?",
                       "choices": ["Yes", "No"], }, ]
         result = prompt(yes_or_no)
         name = result[0]
@@ -465,21 +1341,19 @@ def update_another_field():
     return (name)
 
 
-def update_field():
+def update_field(field):
     """
-    Uses if/elif/else to call the correct function to update the field value
-    based on outcome of select_field()
+    Uses if/elif/else to call the correct function to capture the new
+    value of the field selected with select_field(), validated with the
+    same rules as when adding an employee.
+    Args:
+        field - string header of the field.
     Returns:
         tuple - new_value which is utilised to select
         the column by the header value and to provide
         the change_value, which is the input captured by the user.
     """
     new_value = 0
-    field = select_field()
-    age_range = range(18, 76, 1)
-    salary_range = range(100, 100001, 1)
-    year_range = range(1, 51, 1)
-    month_range = range(1, 11, 1)
     if field == "Name":
         first_name = get_input("first name")
         name = "Name", f"{first_name}"
@@ -489,8 +1363,8 @@ def update_field():
         surname = "Surname", f"{last_name}"
         new_value = surname
     elif field == "Age":
-        how_old = get_number("age", "age", "18 to 75", age_range)
-        age = "Age", f"{how_old}"
+        how_old = get_number("age", "age", "18 to 75", AGE_RANGE)
+        age = "Age", how_old
         new_value = age
     elif field == "Gender":
         assignment = get_gender()
@@ -506,19 +1380,19 @@ def update_field():
         new_value = position
     elif field == "Salary":
         paid = get_number("salary", "salary",
-                          "100 to 100 000", salary_range)
-        salary = "Salary", f"{paid}"
+                          "100 to 100 000", SALARY_RANGE)
+        salary = "Salary", paid
         new_value = salary
     elif field == "Tenure -years":
         service_years = get_number("years of service",
-                                   "years of service", "1 to 50", year_range)
-        years = "Tenure -years", f"{service_years}"
+                                   "years of service", "1 to 50", YEAR_RANGE)
+        years = "Tenure -years", service_years
         new_value = years
     elif field == "Tenure -months":
         service_months = get_number("months of service",
                                     "months of service", "1 to 11",
-                                    month_range)
-        months = "Tenure -months", f"{service_months}"
+                                    MONTH_RANGE)
+        months = "Tenure -months", service_months
         new_value = months
     elif field == "Entry Date":
         entry_date = get_date()
@@ -527,192 +1401,174 @@ def update_field():
     return new_value
 
 
-def update_single_cell(emp_value, worksheet, column_value, change_value):
+def show_employee_changes(emp_value, record, changes):
     """
-    Uses the employee number and the header to find the correct
-    cell in the spreadsheet to update. Overwrites with the new
-    value provided by the user.
+    Prints the fields of the employee that can be updated, with the new
+    value of each field changed so far. The values are shown as they
+    are in the worksheet, so a blank or invalid number can be seen and
+    corrected.
     Args:
-        emp_value - string employee number, worksheet - string worksheet name,
-        column_value - string column header, change_value -
-        string captured by user.
-    References:
-        the following article was referenced
-        to update a single cell value:
-        https://docs.gspread.org/en/latest/user-guide.html#finding-a-cell
-        The following article was referenced to return a cell's address:
-        https://github.com/burnash/gspread/issues/41
+        emp_value - string employee number, record - dictionary of
+        header to the current value, changes - dictionary of header to
+        the new value captured.
+    """
+    print(f"Details of employee {emp_value}:")
+    for header in header_row("redeployment_pool")[1:11]:
+        current = record.get(header, "").strip()
+        if header in changes:
+            print(f"  {header}: {current} -> {changes[header]}")
+        else:
+            print(f"  {header}: {current}")
+    print("  \n")
+
+
+def save_employee_changes(emp_value, row_no, changes):
     """
-    print(f"Updating {worksheet} worksheet...\n")
-    sheet = SHEET.worksheet(worksheet)
-    cell = sheet.find(emp_value)
-    row_no = "%s" % (cell.row)
-    cell_2 = sheet.find(column_value)
-    col_no = "%s" % (cell_2.col)
-    sheet.update_cell(row_no, col_no, change_value)
-    print(f"{worksheet} cell: row{row_no}, col{col_no} successfully"
-          f"updated with value: {change_value} \n")
+    Writes all the changes to the employee in a single batch update.
+    Changed fields in adjacent columns are written as one range.
+    Args:
+        emp_value - string employee number,
+        row_no - integer row the employee was read from,
+        changes - dictionary of header to the new value captured.
+    """
+    print("Updating redeployment_pool worksheet...\n")
+    runs = []
+    for col_no, value in sorted(
+            (column_index("redeployment_pool", header), value)
+            for header, value in changes.items()):
+        if runs and runs[-1][0] + len(runs[-1][1]) == col_no:
+            runs[-1][1].append(value)
+        else:
+            runs.append((col_no, [value]))
+    row = row_reference("redeployment_pool", emp_value, row_no)
+    write_rows([("redeployment_pool", row, col_no, values)
+                for col_no, values in runs])
+    updated = ", ".join(f"{header} {value}"
+                        for header, value in changes.items())
+    print(f"redeployment_pool row{row_no} successfully updated"
+          f" with {updated} \n")
 
 
 def update_process():
     """
     Calls the functions to use inquirer to select the
-    employee and the datafield that the user
-    wishes to update. Calls the function to select/ input
-    new value and triggers the update of the worksheet single cell.
+    employee and, as many times as the user wishes, a datafield
+    and its new value. The changes are saved together once the
+    user selects Save changes, or dropped with Discard changes.
+    The form is built from the row as it is in the worksheet, so
+    that an employee with invalid data can still be corrected.
     """
     emp_value = select_employee()
-    field_updated = update_field()
-    column_value = field_updated[0]
-    change_value = field_updated[1]
-    update_single_cell(emp_value, "redeployment_pool",
-                       column_value, change_value)
+    try:
+        row_no, row = fetch_row("redeployment_pool", emp_value)
+    except ValueError as e:
+        print(f" A ValueError has occurred: {e}")
+        print("Please repeat the update employee process.\n")
+        return
+    record = dict(zip(header_row("redeployment_pool"), row))
+    changes = {}
+    while True:
+        show_employee_changes(emp_value, record, changes)
+        field = select_field()
+        if field == "Save changes":
+            break
+        if field == "Discard changes":
+            print("The changes have been discarded.\n")
+            return
+        column_value, change_value = update_field(field)
+        changes[column_value] = change_value
+    if not changes:
+        print("There are no changes to save.\n")
+        return
+    save_employee_changes(emp_value, row_no, changes)
 
 
 def update_employee():
     """
     Calls the functions to use inquirer to select the
-    employee and the datafield that the user
+    employee and the datafields that the user
     wishes to update.
+    Returns:
+        update_employee to update another employee, otherwise main_menu.
     """
     update_process()
     answer = update_another_field()
     if answer == "Yes":
-        update_process()
-        update_another_field()
-    main()
+        return update_employee
+    return main_menu
 
 
 # The below functions are used to place an employee into
 # a new position and add them to the placed employees sheet
 
 
-def fetch_current_salary(worksheet, emp_value, column_value):
+def update_exit_date_status(worksheet, exit_data, emp_value, status_value):
     """
-    Fetches the current monthly salary of the
-    employee to utilise to update the new monthly
-    salary and calculate the difference.
+    Exits an employee from the redeployment pool as one transaction.
+    Appends the employee to the placed or retrenched worksheet and
+    updates the exit date, days in pool and status on the
+    redeployment_pool sheet in a single request, which the backend
+    applies in full or not at all, so an employee is never listed as
+    placed or retrenched while still Active in the pool. The row is
+    appended by the backend, so another session exiting an employee
+    at the same time cannot overwrite it.
     Args:
-        worksheet - string name of worksheet,
-        emp_value - string employee number,
-        column_value - string name of column.
-    Returns:
-        integer salary value
-    References:
-        the following article was referenced to
-        locate data using cell coordinates:
-        https://www.makeuseof.com/tag/read-write-google-sheets-python/
-        The following article was referenced to return a cell's address:
-        https://github.com/burnash/gspread/issues/41
-    """
-    print(f"Fetching current salary from {worksheet}...\n")
-    sheet = SHEET.worksheet(worksheet)
-    cell = sheet.find(emp_value)
-    row_no = "%s" % (cell.row)
-    cell_2 = sheet.find(column_value)
-    col_no = "%s" % (cell_2.col)
-    salary = sheet.cell(row_no, col_no).value
-    return salary
-
-
-def update_exit_date_status(worksheet, worksheet_two, emp_value, status_value):
-    """
-    Confirms that the employee has been added to the placed
-    worksheet. Updates the exit date and status on the
-    redeployment_pool sheet.
-    Args:
-        worksheet - string name of worksheet,
-        worksheet_two - string name of second worksheet,
+        worksheet - string name of worksheet the employee is added to,
+        exit_data - list of values to add to that worksheet,
         emp_value - string employee number,
         status_value - string value of status column.
     Raises:
         Value Error as e if an error occurs in updating the values in the
         worksheet.
     References:
-        the following article was referenced
-        to update a single cell value:
-        https://docs.gspread.org/en/latest/user-guide.html#finding-a-cell4
-        The following article was referenced to return a cell's address:
-        https://github.com/burnash/gspread/issues/41
         The following article was referenced to convert to date:
         https://stackoverflow.com/questions/52260789/update-googlesheet-cell-with-timestamp-from-python
     """
-    print(f"Fetching employee number from {worksheet}...\n")
-    sheet = SHEET.worksheet(worksheet)
-    cell = sheet.find(emp_value)
     try:
         print("Updating exit date and status")
-        sheet = SHEET.worksheet(worksheet_two)
-        cell = sheet.find(emp_value)
-        row_no = "%s" % (cell.row)
-        cell_2 = sheet.find("Exit Date")
-        col_no = "%s" % (cell_2.col)
+        row_no, employee = fetch_row("redeployment_pool", emp_value)
+        entry_date = employee[column_index("redeployment_pool",
+                                           "Entry Date") - 1]
         today_date = datetime.now().strftime("%d/%m/%Y")
-        sheet.update_cell(row_no, col_no, today_date)
-        print(f"{worksheet_two} cell: row{row_no}, col{col_no} successfully"
-              f"updated with value: {today_date} \n")
-        days_in_pool("redeployment_pool", emp_value)
-        cell_3 = sheet.find("Status")
-        col_2_no = "%s" % (cell_3.col)
-        status_value = status_value
-        sheet.update_cell(row_no, col_2_no, status_value)
-        print(f"{worksheet_two} cell: row{row_no}, col{col_2_no} successfully"
-              f"updated with value: {status_value} \n")
+        days = days_in_pool(entry_date, today_date)
+        row = row_reference("redeployment_pool", emp_value, row_no)
+        write_rows([
+            (worksheet, None, 1, exit_data),
+            ("redeployment_pool", row,
+             column_index("redeployment_pool", "Exit Date"), [today_date]),
+            ("redeployment_pool", row,
+             column_index("redeployment_pool", "Days"), [days]),
+            ("redeployment_pool", row,
+             column_index("redeployment_pool", "Status"), [status_value]),
+            ])
+        print(f"{worksheet} worksheet updated successfully.\n")
+        print(f"redeployment_pool row{row_no} successfully updated with"
+              f" exit date {today_date}, {days} days in pool and"
+              f" status {status_value} \n")
     except ValueError as e:
         print(f" A ValueError has occurred: {e}")
         print("Please repeat the place employee process.\n")
 
 
-def days_in_pool(worksheet, emp_value):
+def days_in_pool(entry_date, exit_date):
     """
-    Retrieves the entry date and exit date from the redeployment pool
-    sheet and splits the values into year, month and day.
-    Calculates the days within the pool and adds it back to the sheet.
+    Splits the entry date and exit date into year, month and day and
+    calculates the days the employee was within the pool.
     Args:
-        worksheet - string name of worksheet,
-        emp_value - string employee number.
+        entry_date - string date DD/MM/YYYY,
+        exit_date - string date DD/MM/YYYY.
+    Returns:
+        integer number of days.
+    Raises:
+        ValueError if either date is not in the format DD/MM/YYYY.
     References:
-        the following article was referenced
-        to update a single cell value:
-        https://docs.gspread.org/en/latest/user-guide.html#finding-a-cell
-        The following article was referenced to
-        locate data using cell coordinates:
-        https://www.makeuseof.com/tag/read-write-google-sheets-python/
-        The following article was referenced to return a cell's address:
-        https://github.com/burnash/gspread/issues/41
         The following article was referenced for the days in pool calculation:
         https://stackoverflow.com/questions/151199/how-to-calculate-number-of-days-between-two-given-dates
-        The following article was referenced to split the string:
-        https://stackoverflow.com/questions/7844118/how-to-convert-comma-delimited-string-to-list-in-python
     """
-    from datetime import date
-
     print("Calculating days in pool...\n")
-    sheet = SHEET.worksheet(worksheet)
-    cell = sheet.find(emp_value)
-    row_no = "%s" % (cell.row)
-    cell_2 = sheet.find("Entry Date")
-    col_no = "%s" % (cell_2.col)
-    entry_date = (sheet.cell(row_no, col_no).value).split("/")
-    entry_year = int(entry_date[2])
-    entry_month = int(entry_date[1])
-    entry_day = int(entry_date[0])
-    cell_3 = sheet.find("Exit Date")
-    col_2_no = "%s" % (cell_3.col)
-    exit_date = (sheet.cell(row_no, col_2_no).value).split("/")
-    exit_year = int(exit_date[2])
-    exit_month = int(exit_date[1])
-    exit_day = int(exit_date[0])
-    d0 = date(entry_year, entry_month, entry_day)
-    d1 = date(exit_year, exit_month, exit_day)
-    days_in_pool = d1 - d0
-    days = str(days_in_pool)
-    days_no = (days[0] + days[1])
-    cell_4 = sheet.find("Days")
-    col_3_no = "%s" % (cell_4.col)
-    sheet.update_cell(row_no, col_3_no, int(days_no))
-    print(f"{worksheet} cell: row{row_no}, col{col_3_no} successfully"
-          f"updated with value: {days_no} \n")
+    d0 = datetime.strptime(entry_date.strip(), "%d/%m/%Y").date()
+    d1 = datetime.strptime(exit_date.strip(), "%d/%m/%Y").date()
+    return (d1 - d0).days
 
 
 def place_employee():
@@ -723,20 +1579,18 @@ def place_employee():
     remains the same. Calls the function to capture the new salary
     dependent on the selection. Adds the updates to the redeployment
     pool worksheet and the employee to the placed employees worksheet.
-    References:
-        to access specific cell and return the value
-        from the dataframe:
-        https://pythonhow.com/accessing-dataframe-columns-rows-and-cells/
     """
     print("You have chosen to place an employee.")
     emp_value = select_employee()
-    sheet = SHEET.worksheet("redeployment_pool")
-    data = sheet.get_all_values()
-    headers = data.pop(0)
-    df = pd.DataFrame(data, columns=headers)
-    df2 = df.set_index("Emp Number", drop=False)
-    name_emp = df2.loc[emp_value, "Name"]
-    surname = df2.loc[emp_value, "Surname"]
+    try:
+        employee = fetch_employee(emp_value, numbers=["salary"])
+    except ValueError as e:
+        print(f" A ValueError has occurred: {e}")
+        print("Please correct the employee details with Update employee"
+              " details and repeat the place employee process.\n")
+        return main_menu
+    name_emp = employee.name
+    surname = employee.surname
     print("Has there been a change in monthly salary?\n")
 
     while True:
@@ -754,8 +1608,7 @@ def place_employee():
     department_position = choose_department_position()
     department = department_position[0]
     position = department_position[1]
-    current_salary = int(fetch_current_salary("redeployment_pool", emp_value,
-                                              "Salary"))
+    current_salary = employee.salary
     if salary_update == "Decrease":
         salary_range = range(100, (current_salary - 1), 1)
         range_value = f"100 to {current_salary - 1}."
@@ -788,10 +1641,9 @@ def place_employee():
     placed_employee = [emp_value, name_emp, surname, department, position,
                        current_salary, paid, difference, status]
 
-    update_sheet(placed_employee, "placed_employees")
-    update_exit_date_status("placed_employees",
-                            "redeployment_pool", emp_value, "Placed")
-    main()
+    update_exit_date_status("placed_employees", placed_employee,
+                            emp_value, "Placed")
+    return main_menu
 
 
 def choose_department_position():
@@ -818,109 +1670,356 @@ def retrench_employee():
     """
     Calls the functions required to retrench an employee. Calculates the
     retrenchment package. Adds the new data  to the spreadsheet.
-    References:
-        to access specific cell and return the value
-        from the dataframe:
-        https://pythonhow.com/accessing-dataframe-columns-rows-and-cells/
-        The following article was referenced to locate data
-        using cell coordinates:
-        https://www.makeuseof.com/tag/read-write-google-sheets-python/
-        The following article was referenced to return a cell's address:
-        https://github.com/burnash/gspread/issues/41
     """
     print("You have chosen to retrench an employee.")
     emp_value = select_employee()
-    sheet = SHEET.worksheet("redeployment_pool")
-    data = sheet.get_all_values()
-    headers = data.pop(0)
-    df = pd.DataFrame(data, columns=headers)
-    df2 = df.set_index("Emp Number", drop=False)
-    name = df2.loc[emp_value, "Name"]
-    surname = df2.loc[emp_value, "Surname"]
+    try:
+        employee = fetch_employee(emp_value, numbers=["salary",
+                                                      "tenure_years",
+                                                      "tenure_months"])
+    except ValueError as e:
+        print(f" A ValueError has occurred: {e}")
+        print("Please correct the employee details with Update employee"
+              " details and repeat the retrench employee process.\n")
+        return main_menu
+    name = employee.name
+    surname = employee.surname
     print("Calculating retrenchment package...\n")
-    print("Fetching salary...\n")
-    sheet = SHEET.worksheet("redeployment_pool")
-    cell = sheet.find(emp_value)
-    row_no = "%s" % (cell.row)
-    cell_2 = sheet.find("Salary")
-    col_no = "%s" % (cell_2.col)
-    salary_current = (sheet.cell(row_no, col_no).value)
-    print("Fetching Tenure -years...\n")
-    sheet = SHEET.worksheet("redeployment_pool")
-    cell_3 = sheet.find("Tenure -years")
-    col_2_no = "%s" % (cell_3.col)
-    tenure_years = (sheet.cell(row_no, col_2_no).value)
-    print("Fetching Tenure -months...\n")
-    sheet = SHEET.worksheet("redeployment_pool")
-    cell_4 = sheet.find("Tenure -months")
-    col_3_no = "%s" % (cell_4.col)
-    tenure_months = (sheet.cell(row_no, col_3_no).value)
-    package = ((int(salary_current) * int(tenure_years)) +
-               (int(tenure_months) // 12 * int(salary_current)))
+    salary_current = employee.salary
+    tenure_years = employee.tenure_years
+    tenure_months = employee.tenure_months
+    package = ((salary_current * tenure_years) +
+               (tenure_months // 12 * salary_current))
     print(f"Retrenchment package calculated as {package}.\n")
     retrenched_employee = [emp_value, name, surname, package]
-    update_sheet(retrenched_employee, "retrenched_employees")
-    update_exit_date_status("retrenched_employees",
-                            "redeployment_pool", emp_value, "Retren.")
-    main()
+    update_exit_date_status("retrenched_employees", retrenched_employee,
+                            emp_value, "Retren.")
+    return main_menu
+
+
+# The below functions are utilised to add a batch of employees
+# to the redeployment pool from a CSV or Excel file.
+
+
+def read_import_file(path):
+    """
+    Reads a CSV or Excel file of employees into a dataframe, keeping
+    every value as a string as if it had been typed in. Excel date
+    cells are written as DD/MM/YYYY.
+    Args:
+        path - string path of the .csv or .xlsx file.
+    Returns:
+        dataframe with the columns of the file.
+    Raises:
+        ValueError if the file type is not supported or a column of the
+        redeployment pool is missing.
+    """
+    import pandas as pd
+
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    elif path.lower().endswith(".xlsx"):
+        df = pd.read_excel(path, dtype=object, keep_default_na=False)
+        df = df.apply(lambda column: column.map(excel_text))
+    else:
+        raise ValueError(f"{path} is not a .csv or .xlsx file")
+    df.columns = [str(column).strip() for column in df.columns]
+    missing = [header for header in IMPORT_HEADERS if header not in df]
+    if missing:
+        raise ValueError(f"{path} is missing the columns {missing}")
+    return df[IMPORT_HEADERS].apply(lambda column: column.str.strip())
+
+
+def excel_text(value):
+    """
+    Returns an Excel cell value as it would have been typed in, dates
+    being written as DD/MM/YYYY.
+    Args:
+        value - the cell value read by pandas.
+    Returns:
+        string.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d/%m/%Y")
+    return str(value)
+
+
+def validate_import(df, existing):
+    """
+    Validates every row of the import at once with the same checks as
+    the interactive prompts.
+    Args:
+        df - dataframe of the import, existing - collection of the
+        employee numbers already in the redeployment pool.
+    Returns:
+        list of ValidationError, the row being the dataframe index.
+    """
+    errors = check_numbers(df["Emp Number"], existing)
+    for header in ["Name", "Surname", "Department", "Position"]:
+        errors += check_text(df[header], header)
+    errors += check_range(df["Age"], "Age", AGE_RANGE, "18 to 75")
+    errors += check_choice(df["Gender"], "Gender", GENDERS)
+    errors += check_range(df["Salary"], "Salary", SALARY_RANGE,
+                          "100 to 100 000")
+    errors += check_range(df["Tenure -years"], "Tenure -years", YEAR_RANGE,
+                          "1 to 50")
+    errors += check_range(df["Tenure -months"], "Tenure -months",
+                          MONTH_RANGE, "1 to 11")
+    errors += check_dates(df["Entry Date"])
+    return sorted(errors, key=lambda error: error.row)
+
+
+def import_employees():
+    """
+    Adds every employee in a CSV or Excel file to the redeployment pool.
+    All rows are validated in one pass and every problem is reported,
+    then the valid rows are saved with a single batch write.
+    """
+    print("Please enter the path of the CSV or Excel file to import.")
+    print("The file needs the columns: " + ", ".join(IMPORT_HEADERS) + ".\n")
+    path = input("Enter the file path here:\n")
+    try:
+        df = read_import_file(path)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"The file could not be read: {e}\n")
+        return main_menu
+    errors = validate_import(df, employee_numbers("redeployment_pool"))
+    for error in errors:
+        print(f"Row {error.row + 2}: {error.field}: {error.message}")
+    valid = ~df.index.isin([error.row for error in errors])
+    df = df[valid].copy()
+    for column in ["Name", "Surname", "Department", "Position"]:
+        df[column] = df[column].str.title()
+    for column in NUMBER_HEADERS:
+        df[column] = df[column].astype(int)
+    print(f"\n{len(df)} of {len(valid)} employees are valid.\n")
+    if len(df):
+        print("Updating redeployment_pool worksheet...\n")
+        write_rows([("redeployment_pool", None, 1,
+                     employee + [" ", " ", "Active"])
+                    for employee in df.values.tolist()])
+        print("redeployment_pool worksheet updated successfully.\n")
+    return main_menu
 
 
 # The below functions are utilised to fetch the worksheets,
 # and setup the dataframe display to display the data tables in
-# the console.
+# the console. Each worksheet is loaded into a dataframe once per
+# snapshot version and each table is sorted and measured from it once,
+# so paging through the reports only downloads and sorts the data
+# again after a write or once the snapshot has expired. Tables are
+# shown PAGE_ROWS rows at a time and only the page shown is formatted.
 
+PAGE_ROWS = 25
+REPORT_FRAMES = {}
+REPORT_VIEWS = {}
 
-def display_remove_rows(worksheet, sort_by, columns_list):
+
+def typed_frame(worksheet, data):
     """
-    Fetches the worksheet from google sheets. Returns all
-    data and creates headers as columns. Sorts the data, and
-    drops unwanted columns. Removes rows of employees who's
-    status is Active. Removes the index from the display.
+    Loads worksheet values into a dataframe with the column types of
+    storage.WORKSHEET_TYPES. Blank or invalid numbers and dates become
+    missing values instead of failing the conversion.
+    Args:
+        worksheet - string name of worksheet,
+        data - list of rows, the first being the headers.
+    Returns:
+        dataframe with the worksheet headers as columns.
+    """
+    import pandas as pd
+
+    types = storage.WORKSHEET_TYPES.get(worksheet, {})
+    df = pd.DataFrame(data[1:], columns=data[0])
+    columns = {}
+    for header in df.columns:
+        kind = types.get(header)
+        values = df[header]
+        if kind == "category":
+            columns[header] = values.astype("category")
+        elif kind == "int32":
+            numbers = pd.to_numeric(values.str.strip().str.replace(",", ""),
+                                    errors="coerce")
+            columns[header] = numbers.where(numbers % 1 == 0).astype("Int32")
+        elif kind == "date":
+            columns[header] = pd.to_datetime(values.str.strip(),
+                                             format="%d/%m/%Y",
+                                             errors="coerce")
+        else:
+            columns[header] = values
+    return pd.DataFrame(columns, columns=df.columns)
+
+
+def format_column(values):
+    """
+    Formats a column for display, writing dates as dd/mm/yyyy and
+    missing values as blanks as in the worksheet.
+    Args:
+        values - series of any column type.
+    Returns:
+        series of strings.
+    """
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.dt.strftime("%d/%m/%Y").fillna("")
+    return values.astype("string").fillna("")
+
+
+def report_frame(worksheet):
+    """
+    Returns the typed dataframe of the current snapshot of the
+    worksheet, converting the snapshot only when its version has
+    changed. The dataframe is shared and must not be modified.
+    Args:
+        worksheet - string name of worksheet.
+    Returns:
+        dataframe with the worksheet headers as columns.
+    """
+    version = snapshot_version(worksheet)
+    cached = REPORT_FRAMES.get(worksheet)
+    if cached is None or cached["version"] != version:
+        cached = {"version": version,
+                  "frame": typed_frame(worksheet, fetch_snapshot(worksheet))}
+        REPORT_FRAMES[worksheet] = cached
+    return cached["frame"]
+
+
+def report_view(worksheet, sort_by, columns_list, remove_active=False):
+    """
+    Returns a data table of the worksheet. Sorts the data, drops
+    unwanted columns and optionally removes the rows of employees whose
+    status is Active. The width of each column is measured over the
+    whole table, so every page lines up. The table is rebuilt only when
+    the snapshot version of the worksheet has changed.
     Args:
          worksheet - string name of worksheet,
          sort_by - string column name to sort data by,
-         columns_list - list of columns to be dropped.
+         columns_list - list of columns to be dropped,
+         remove_active - boolean, True to remove Active employees.
+    Returns:
+        dictionary of the dataframe, the positions of its rows in table
+        order, the columns shown and their widths.
     References:
         The following article was referenced to create the .loc
         code:
         https://re-thought.com/how-to-change-or-update-a-cell-value-in-python-pandas-dataframe/
-        The following article was referenced for dataframe formatting:
-        https://mode.com/example-gallery/python_dataframe_styling/
+    """
+    version = snapshot_version(worksheet)
+    key = (worksheet, sort_by, tuple(columns_list), remove_active)
+    cached = REPORT_VIEWS.get(key)
+    if cached is None or cached["version"] != version:
+        frame = report_frame(worksheet)
+        df = frame.sort_values(by=sort_by)
+        if remove_active:
+            df = df.loc[df["Status"] != "Active"]
+        columns = list(frame.columns.drop(frame.columns[columns_list]))
+        widths = []
+        for column in columns:
+            lengths = format_column(df[column]).str.len()
+            widths.append(max([len(column)] + list(lengths.nlargest(1))))
+        cached = {"version": version, "frame": frame,
+                  "rows": df.index.to_numpy(), "columns": columns,
+                  "widths": widths}
+        REPORT_VIEWS[key] = cached
+    return cached
+
+
+def format_page(view, page):
+    """
+    Formats one page of a data table, right aligning every column to
+    its width as pandas does.
+    Args:
+        view - dictionary from report_view(), page - integer page
+        number starting at 0.
+    Returns:
+        string of the header and the rows of the page.
+    """
+    start = page * PAGE_ROWS
+    rows = view["frame"].iloc[view["rows"][start:start + PAGE_ROWS]]
+    cells = [format_column(rows[column]).tolist()
+             for column in view["columns"]]
+    lines = [" ".join(column.rjust(width) for column, width
+                      in zip(view["columns"], view["widths"]))]
+    for row in zip(*cells):
+        lines.append(" ".join(value.rjust(width)
+                              for value, width in zip(row, view["widths"])))
+    return "\n".join(lines)
+
+
+def page_table(view):
+    """
+    Displays a data table one page at a time. After each page the user
+    can move to the next or previous page, jump to a page or return to
+    the data tables. Tables fitting on one page are displayed at once.
+    Args:
+        view - dictionary from report_view().
+    References:
         The following article was referenced to hide columns and index:
         https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.io.formats.style.Styler.hide_columns.html#pandas.io.formats.style.Styler.hide_columns
     """
-    wks = SHEET.worksheet(worksheet)
-    data = wks.get_all_values()
-    headers = data.pop(0)
-    df = pd.DataFrame(data, columns=headers)
-    df = df.sort_values(by=sort_by)
-    df = df.drop(df.columns[columns_list], axis=1)
-    df = df.loc[df["Status"] != "Active"]
-    display((df.to_string(index=False)))
+    from IPython.display import display
+
+    total = len(view["rows"])
+    pages = max(1, -(-total // PAGE_ROWS))
+    page = 0
+    while True:
+        display(format_page(view, page))
+        if pages == 1:
+            return
+        first = page * PAGE_ROWS + 1
+        last = min(total, first + PAGE_ROWS - 1)
+        print(f"\nPage {page + 1} of {pages}, rows {first} to {last}"
+              f" of {total}.\n")
+        choices = []
+        if page < pages - 1:
+            choices.append("Next page")
+        if page > 0:
+            choices.append("Previous page")
+        choices += ["Jump to page", "Return to the data tables"]
+        pager = [{"type": "list",
+                  "message": "Please select an option",
+                  "choices": choices, }, ]
+        result = prompt(pager)
+        name = result[0]
+        if name == "Next page":
+            page += 1
+        elif name == "Previous page":
+            page -= 1
+        elif name == "Jump to page":
+            while True:
+                number = input("Enter the page number here:\n")
+                if validate_range(number, f"1 to {pages}.",
+                                  range(1, pages + 1)):
+                    break
+            page = int(number) - 1
+        else:
+            return
+
+
+def display_remove_rows(worksheet, sort_by, columns_list):
+    """
+    Displays a data table of the worksheet without the employees
+    whose status is Active.
+    Args:
+         worksheet - string name of worksheet,
+         sort_by - string column name to sort data by,
+         columns_list - list of columns to be dropped.
+    """
+    finish_prefetch()
+    page_table(report_view(worksheet, sort_by, columns_list,
+                           remove_active=True))
 
 
 def display_redeployment_pool(worksheet, sort_by, columns_list):
     """
-    Fetches the worksheet from google sheets. Returns all
-    data and creates headers as columns. Sorts the data, and
-    drops unwanted columns. Removes the index from the display.
+    Displays a data table of the worksheet.
     Args:
          worksheet - string name of worksheet,
          sort_by - string column name to sort data by,
          columns_list - list of columns to be dropped.
-    References:
-        The following article was referenced for dataframe formatting:
-        https://mode.com/example-gallery/python_dataframe_styling/
-        The following article was referenced to hide columns and index:
-        https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.io.formats.style.Styler.hide_columns.html#pandas.io.formats.style.Styler.hide_columns
     """
-    wks = SHEET.worksheet(worksheet)
-    data = wks.get_all_values()
-    headers = data.pop(0)
-    df = pd.DataFrame(data, columns=headers)
-    df = df.sort_values(by=sort_by)
-    df = df.drop(df.columns[columns_list], axis=1)
-    display((df.to_string(index=False)))
+    finish_prefetch()
+    page_table(report_view(worksheet, sort_by, columns_list))
 
 
 def summary_report():
@@ -935,7 +2034,7 @@ def summary_report():
     display_redeployment_pool("redeployment_pool", "Status",
                               [3, 4, 5, 6, 7, 8, 9, 11, 12])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def personal_details_report():
@@ -950,7 +2049,7 @@ def personal_details_report():
     display_redeployment_pool("redeployment_pool", "Gender",
                               [5, 6, 7, 8, 9, 10, 11, 12, 13])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def placed_employees_report():
@@ -964,7 +2063,7 @@ def placed_employees_report():
     display_redeployment_pool("placed_employees", "New Dep",
                               [5, 6, 7, 8])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def department_position_report():
@@ -979,7 +2078,7 @@ def department_position_report():
     display_redeployment_pool("redeployment_pool", "Department",
                               [3, 4, 7, 8, 9, 10, 11, 12, 13])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def salary_comparison_report():
@@ -994,7 +2093,7 @@ def salary_comparison_report():
     display_redeployment_pool("placed_employees", "Status",
                               [3, 4])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def days_within_pool_report():
@@ -1009,7 +2108,7 @@ def days_within_pool_report():
     display_remove_rows("redeployment_pool", "Days",
                         [3, 4, 5, 6, 7, 8, 9])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def salary_and_tenure_report():
@@ -1025,7 +2124,7 @@ def salary_and_tenure_report():
     display_redeployment_pool("redeployment_pool", "Salary",
                               [3, 4, 5, 6, 10, 11, 12, 13])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
 
 
 def retrenched_report():
@@ -1041,15 +2140,93 @@ def retrenched_report():
     display_redeployment_pool("retrenched_employees", "Package",
                               [])
     print("  \n")
-    red_pool_tables()
+    return red_pool_tables
+
+
+# The below code downloads the data the next screen may need while
+# the user is reading a menu. The menus start a prefetch in a
+# background thread before prompting, and the screens using the data
+# wait for it to finish, so it is only downloaded once and they open
+# from the warm caches. Screens not using it do not wait. The calls of
+# a prefetch are profiled under PREFETCH_ACTION and moved to the
+# screen that waits for it, or to UNUSED_PREFETCH_ACTION if no screen
+# does. PREFETCH_LOCK is held while a loader runs and while write_rows
+# writes, so data downloaded before a write is never cached after it.
+
+PREFETCH_THREAD = None
+PREFETCH_LOCK = threading.RLock()
+PREFETCH_ACTION = "prefetch"
+UNUSED_PREFETCH_ACTION = "unused_prefetch"
+
+
+def prefetch(*loaders):
+    """
+    Calls each loader in turn in a background thread. Errors are left
+    to be raised again when the screen reads the data itself.
+    Args:
+        loaders - functions filling the caches.
+    """
+    global PREFETCH_THREAD
+    finish_prefetch(UNUSED_PREFETCH_ACTION)
+
+    def load_all():
+        with profiling.PROFILE.acting(PREFETCH_ACTION):
+            for loader in loaders:
+                try:
+                    with PREFETCH_LOCK:
+                        loader()
+                except Exception:
+                    pass
+
+    PREFETCH_THREAD = threading.Thread(target=load_all, daemon=True)
+    PREFETCH_THREAD.start()
+
+
+def finish_prefetch(action=None):
+    """
+    Waits for the running prefetch, if any, to finish and files its
+    backend calls under the action it served.
+    Args:
+        action - string action, the active screen if None.
+    """
+    global PREFETCH_THREAD
+    if PREFETCH_THREAD is not None:
+        PREFETCH_THREAD.join()
+        PREFETCH_THREAD = None
+        profiling.PROFILE.move(PREFETCH_ACTION,
+                               action or profiling.PROFILE.action)
+
+
+def prefetch_employees():
+    """
+    Loads the headers of the redeployment pool and the employee search
+    index used by the update, place and retrench screens. Only the
+    columns shown in the search are read, not the whole worksheet.
+    """
+    prefetch(lambda: header_row("redeployment_pool"),
+             lambda: employee_search("redeployment_pool"))
+
+
+def prefetch_reports():
+    """
+    Loads the dataframes of the three worksheets used by the data
+    tables.
+    """
+    prefetch(lambda: fetch_snapshots(list(storage.WORKSHEET_HEADERS)),
+             *[lambda worksheet=worksheet: report_frame(worksheet)
+               for worksheet in storage.WORKSHEET_HEADERS])
 
 
 def red_pool_tables():
     """
     Utilises inquirer to provide the user a list of
-    the available reports. Calls the relevant function
-    based on the report selected to display within terminal.
+    the available reports. The worksheets are loaded in the background
+    while the list is shown.
+    Returns:
+        the report function selected to display within terminal,
+        or main_menu.
     """
+    prefetch_reports()
     while True:
         tables_select = [{"type": "list",
                           "message": "Please select the table you"
@@ -1068,39 +2245,45 @@ def red_pool_tables():
         break
     selection = name
     if selection == "Redeployment Pool Summary":
-        summary_report()
+        return summary_report
     elif selection == "Personal Details Summary":
-        personal_details_report()
+        return personal_details_report
     elif selection == "Department and Position":
-        department_position_report()
+        return department_position_report
     elif selection == "Placed Employees":
-        placed_employees_report()
+        return placed_employees_report
     elif selection == "Salary Comparison":
-        salary_comparison_report()
+        return salary_comparison_report
     elif selection == "Days within Pool":
-        days_within_pool_report()
+        return days_within_pool_report
     elif selection == "Salary and Tenure":
-        salary_and_tenure_report()
+        return salary_and_tenure_report
     elif selection == "Retrenched Employees":
-        retrenched_report()
-    elif selection == "Return to Main Menu":
-        main()
+        return retrenched_report
+    return main_menu
 
 
-# The below function calls the main menu from which the user
-# selects the relevant actions to follow
+# The below functions call the main menu from which the user
+# selects the relevant actions to follow. Every screen returns the
+# screen to show next instead of calling it, and main() runs the
+# screens one after another in a loop. Each finished screen therefore
+# releases its frames and data, however long the session runs.
 
 
-def main():
+def main_menu():
     """
     Utilises inquirer to provide the user a list of
-    actions to perform. Calls the relevant function
-    based on the action selected.
+    actions to perform. The employees are loaded in the background
+    while the list is shown.
+    Returns:
+        the function of the action selected, or None to exit.
     """
+    prefetch_employees()
     while True:
         questions = [{"type": "list",
                      "message": "Please select an action",
                       "choices": ["Add a new employee",
+                                  "Import employees from a file",
                                   "Update employee details",
                                   "Place an employee", "Retrench"
                                   " an employee",
@@ -1111,19 +2294,47 @@ def main():
         break
     selection = name
     if selection == "Add a new employee":
-        return add_employee()
+        return add_employee
+    elif selection == "Import employees from a file":
+        return import_employees
     elif selection == "Update employee details":
-        return update_employee()
+        return update_employee
     elif selection == "Place an employee":
-        return place_employee()
+        return place_employee
     elif selection == "Retrench an employee":
-        return retrench_employee()
+        return retrench_employee
     elif selection == "Data Tables":
-        return red_pool_tables()
+        return red_pool_tables
     elif selection == "Exit the process":
         print("Thank you for your time.")
+    return None
 
 
-print("  \n")
-print("Welcome to the capture screen for the Redeployment Process.\n")
-main()
+def main():
+    """
+    Runs the application, starting at the main menu. Each screen
+    function is called in turn and returns the next screen, until
+    the user exits the process. The backend calls are profiled by
+    screen and the profile is written out when the session ends.
+    """
+    screen = main_menu
+    try:
+        while screen is not None:
+            profiling.PROFILE.action = screen.__name__
+            start = time.perf_counter()
+            next_screen = screen()
+            profiling.PROFILE.record_screen(screen.__name__,
+                                            time.perf_counter() - start)
+            screen = next_screen
+    finally:
+        save_pending_changes()
+        report = profiling.PROFILE.report()
+        report["cache"] = snapshot_statistics()
+        profiling.write_report(report)
+
+
+if __name__ == "__main__":
+    print("  \n")
+    print("Welcome to the capture screen for the Redeployment Process.\n")
+    connect_in_background()
+    main()
@@ -0,0 +1,130 @@
+# Long-lived service that keeps a pool of pre-warmed run.py sessions
+# for index.js. The server imports run.py, authorises with the storage
+# backend and downloads the worksheets once, then forks workers which
+# inherit all of this. Each worker waits for one connection on the
+# session socket, runs the application over it and exits, and the
+# server forks a replacement so that a warm session is always waiting.
+# The writes a worker could not save before it exited are left in its
+# journal, which the server replays once it has reaped the worker.
+import os
+import select
+import signal
+import socket
+import sys
+import traceback
+import profiling
+import run
+import storage
+
+POOL_SIZE = int(os.environ.get("SESSION_POOL_SIZE", "4"))
+SOCKET_PATH = os.environ.get("SESSION_SOCKET", "sessions.sock")
+
+
+def warm_up():
+    """
+    Connects to the storage backend, imports the modules used by the
+    reports and fills the snapshot cache with every worksheet, so that
+    forked sessions start with all of them. Errors are printed and
+    left for the sessions to raise again.
+    """
+    try:
+        run.backend()
+        import pandas  # noqa: F401
+        from IPython.display import display  # noqa: F401
+        for worksheet in storage.WORKSHEET_HEADERS:
+            run.fetch_snapshot(worksheet)
+    except Exception as e:
+        print(f"Session pool could not warm up: {e}")
+
+
+def run_session(listener, accepted):
+    """
+    Runs in a forked worker. Waits for one connection, tells the server
+    it was taken and runs the application with the connection as its
+    standard input and output.
+    Args:
+        listener - the listening session socket,
+        accepted - file descriptor of the pipe to the server.
+    """
+    connection, address = listener.accept()
+    listener.close()
+    os.write(accepted, f"{os.getpid()}\n".encode())
+    os.close(accepted)
+    for fd in (0, 1, 2):
+        os.dup2(connection.fileno(), fd)
+    connection.close()
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+    if run.BACKEND is not None:
+        run.BACKEND.after_fork()
+    profiling.PROFILE.reset()
+    print("  \n")
+    print("Welcome to the capture screen for the Redeployment Process.\n")
+    run.main()
+
+
+def fork_worker(listener, accepted):
+    """
+    Forks a worker which runs one session and then exits.
+    Returns:
+        the process id of the worker.
+    """
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_session(listener, accepted)
+        except (EOFError, KeyboardInterrupt, BrokenPipeError):
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    """
+    Opens the session socket and keeps POOL_SIZE warm workers waiting
+    on it. Workers report their process id once they take a connection
+    and a replacement is forked, after refreshing the snapshot cache if
+    it has expired. Finished workers are reaped every second and the
+    writes left in their journals are queued to be saved.
+    """
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(SOCKET_PATH)
+    listener.listen(64)
+    accepted_read, accepted_write = os.pipe()
+    warm_up()
+    idle = {fork_worker(listener, accepted_write)
+            for worker in range(POOL_SIZE)}
+    print(f"Session pool ready with {POOL_SIZE} sessions on {SOCKET_PATH}")
+    while True:
+        ready, _, _ = select.select([accepted_read], [], [], 1)
+        if ready:
+            for pid in os.read(accepted_read, 4096).split():
+                idle.discard(int(pid))
+        reaped = False
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            idle.discard(pid)
+            reaped = True
+        if reaped and run.BACKEND is not None:
+            run.BACKEND.replay_stale_journals()
+        while len(idle) < POOL_SIZE:
+            if any(run.cached_values(worksheet, "all") is None
+                   for worksheet in storage.WORKSHEET_HEADERS):
+                warm_up()
+            idle.add(fork_worker(listener, accepted_write))
+
+
+if __name__ == "__main__":
+    main()
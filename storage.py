@@ -0,0 +1,815 @@
+# Storage backends for the redeployment report workbook.
+# The application reads and writes the three worksheets only through
+# the methods of StorageBackend, so the Google Sheets workbook can be
+# swapped for a local SQLite database with the same column layout.
+# gspread and google-auth are only imported when connecting to
+# Google Sheets, and every Google Sheets request is sent through a
+# RequestScheduler that keeps within the API quota.
+import os
+import random
+import sqlite3
+import threading
+import time
+
+# The column layout of the worksheets in the redeployment report.
+
+WORKSHEET_HEADERS = {
+    "redeployment_pool": ["Emp Number", "Name", "Surname", "Age", "Gender",
+                          "Department", "Position", "Salary",
+                          "Tenure -years", "Tenure -months", "Entry Date",
+                          "Exit Date", "Days", "Status"],
+    "placed_employees": ["Emp Number", "Name", "Surname", "New Dep",
+                         "New Pos", "Old Salary", "New Salary", "Diff.",
+                         "Status"],
+    "retrenched_employees": ["Emp Number", "Name", "Surname", "Package"],
+    }
+
+# The type of each column when a worksheet is loaded into a dataframe:
+# "category" for codes and repeated labels, "int32" for whole numbers
+# and "date" for dd/mm/yyyy dates. Columns not listed stay strings.
+
+WORKSHEET_TYPES = {
+    "redeployment_pool": {"Emp Number": "category", "Age": "int32",
+                          "Gender": "category", "Department": "category",
+                          "Position": "category", "Salary": "int32",
+                          "Tenure -years": "int32",
+                          "Tenure -months": "int32", "Entry Date": "date",
+                          "Exit Date": "date", "Days": "int32",
+                          "Status": "category"},
+    "placed_employees": {"Emp Number": "category", "New Dep": "category",
+                         "New Pos": "category", "Old Salary": "int32",
+                         "New Salary": "int32", "Diff.": "int32",
+                         "Status": "category"},
+    "retrenched_employees": {"Emp Number": "category", "Package": "int32"},
+    }
+
+# Setup the scope and credentials for
+# accessing google sheets. This was created as per the
+# Code Institute Love Sandwiches project.
+
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive"
+    ]
+
+# The Google Sheets API allows 60 read and 60 write requests per minute
+# per user. The scheduler sends at most SHEETS_REQUESTS_PER_MINUTE
+# requests a minute, in bursts of up to SHEETS_BURST requests, and
+# retries a request refused for quota or server errors up to
+# SHEETS_MAX_RETRIES times.
+
+SHEETS_REQUESTS_PER_MINUTE = float(
+    os.environ.get("SHEETS_REQUESTS_PER_MINUTE", "60"))
+SHEETS_BURST = int(os.environ.get("SHEETS_BURST", "10"))
+SHEETS_MAX_RETRIES = int(os.environ.get("SHEETS_MAX_RETRIES", "6"))
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 64
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Every attempt at a Sheets API request, retries included, is reported
+# to the functions added with observe_requests(), such as the profiler.
+
+REQUEST_OBSERVERS = []
+
+
+class ScheduledRequest:
+    """
+    A request shared by the threads waiting for its result, either a
+    read several threads asked for at once or a write queued behind
+    the one being sent.
+    """
+
+    def __init__(self, data=None):
+        self.data = data
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+    def wait(self):
+        """
+        Waits for the request to be sent.
+        Returns:
+            the result of the request.
+        Raises:
+            the exception the request failed with.
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RequestScheduler:
+    """
+    Sends the Google Sheets requests of all threads within the quota.
+    Requests take a token from a token bucket refilled at
+    requests_per_minute, identical reads in flight at the same time
+    are sent once, writes queued while another write is being sent
+    go out together as one batch update, and requests refused with
+    a quota or server error are retried after a jittered exponential
+    backoff. Every attempt is reported to the request observers.
+    References:
+        Google Sheets API usage limits:
+        https://developers.google.com/sheets/api/limits
+        Exponential backoff and jitter:
+        https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    """
+
+    def __init__(self, requests_per_minute=SHEETS_REQUESTS_PER_MINUTE,
+                 burst=SHEETS_BURST, max_retries=SHEETS_MAX_RETRIES):
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self.max_retries = max_retries
+        self.tokens = burst
+        self.refilled = time.monotonic()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.reads = {}
+        self.writes = []
+
+    def acquire(self):
+        """
+        Takes a token from the bucket, sleeping until one is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens
+                                  + (now - self.refilled) * self.rate)
+                self.refilled = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def call(self, function, *args, retry=None, **kwargs):
+        """
+        Sends one request, retrying it while it fails with a quota or
+        server error. A refused request also empties the bucket, so
+        the other threads slow down until the quota recovers.
+        Args:
+            function - the gspread call, args and kwargs - its arguments,
+            retry - function telling whether an error may be retried,
+            retryable if None. Requests that must not be applied twice
+            pass refused.
+        Returns:
+            the result of the call.
+        Raises:
+            the last error when the request cannot be retried again.
+        """
+        retry = retry or retryable
+        name = getattr(function, "__name__", type(function).__name__)
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                report_request(name, attempt, time.perf_counter() - start,
+                               e)
+                if attempt == self.max_retries or not retry(e):
+                    raise
+                with self.lock:
+                    self.tokens = min(self.tokens, 0)
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(
+                        0, min(RETRY_MAX_DELAY,
+                               RETRY_BASE_DELAY * 2 ** attempt))
+                time.sleep(delay)
+            else:
+                report_request(name, attempt, time.perf_counter() - start,
+                               None)
+                return result
+
+    def read(self, key, function, *args):
+        """
+        Sends a read request, unless an identical one is already in
+        flight, in which case its result is shared.
+        Args:
+            key - hashable description of the request,
+            function and args - the gspread call and its arguments.
+        Returns:
+            the result of the call. The lists and dictionaries of the
+            values read are copied for the threads sharing it.
+        """
+        with self.lock:
+            request = self.reads.get(key)
+            sender = request is None
+            if sender:
+                request = self.reads[key] = ScheduledRequest()
+        if not sender:
+            return copy_values(request.wait())
+        try:
+            result = self.call(function, *args)
+        except Exception as e:
+            request.finish(error=e)
+            raise
+        finally:
+            with self.lock:
+                del self.reads[key]
+        request.finish(result)
+        return result
+
+    def write(self, function, data):
+        """
+        Queues a list of value ranges to write. The thread holding the
+        write lock sends everything queued so far with one request,
+        so writes made while a request is in flight are batched.
+        Args:
+            function - the gspread call taking the list of value ranges,
+            data - the value ranges to write.
+        Raises:
+            the error of the batch the value ranges were sent in.
+        """
+        request = ScheduledRequest(data)
+        with self.lock:
+            self.writes.append(request)
+        with self.write_lock:
+            if not request.done.is_set():
+                with self.lock:
+                    batch, self.writes = self.writes, []
+                try:
+                    self.call(function, [value_range for queued in batch
+                                         for value_range in queued.data])
+                    error = None
+                except Exception as e:
+                    error = e
+                for queued in batch:
+                    queued.finish(error=error)
+        request.wait()
+
+
+def observe_requests(observer):
+    """
+    Adds a function to be called after every attempt at a Sheets API
+    request, in the thread that sent it.
+    Args:
+        observer - function taking the name of the request, the
+        attempt number, 0 for the first, the float seconds it took and
+        the exception it failed with, or None if it succeeded.
+    """
+    REQUEST_OBSERVERS.append(observer)
+
+
+def report_request(name, attempt, seconds, error):
+    """
+    Reports an attempt at a request to the observers.
+    """
+    for observer in REQUEST_OBSERVERS:
+        observer(name, attempt, seconds, error)
+
+
+def copy_values(values):
+    """
+    Copies the lists and dictionaries of values returned by a read, so
+    threads sharing the read never share a row. Any other object is
+    returned as it is.
+    """
+    if isinstance(values, list):
+        return [copy_values(value) for value in values]
+    if isinstance(values, dict):
+        return {key: copy_values(value) for key, value in values.items()}
+    return values
+
+
+def retryable(error):
+    """
+    Checks whether a failed request may succeed if sent again, as for
+    quota errors, server errors and dropped connections.
+    """
+    import requests
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in RETRY_STATUSES
+
+
+def refused(error):
+    """
+    Checks whether a failed request was refused for the quota, so it
+    was certainly not applied and may be sent again.
+    """
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def appended_row(response):
+    """
+    Returns the first row written by a values_append request, from the
+    range reported back, e.g. 15 for 'redeployment_pool'!A15:N16.
+    Returns:
+        integer row number, or None if the response holds no range.
+    """
+    updated_range = (response or {}).get("updates", {}).get("updatedRange",
+                                                            "")
+    first_cell = updated_range.rpartition("!")[2].split(":")[0]
+    digits = "".join(char for char in first_cell if char.isdigit())
+    return int(digits) if digits else None
+
+
+def retry_after(error):
+    """
+    Returns the seconds to wait given by the Retry-After header of a
+    refused request, or None if there is no such header.
+    """
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class StorageBackend:
+    """
+    The operations the application performs on the worksheets.
+    Rows and columns are numbered from 1 as in Google Sheets, row 1
+    holding the headers, and all values are returned as strings.
+    """
+
+    def get_all_values(self, worksheet):
+        """
+        Returns every row of the worksheet, the first being the headers.
+        Args:
+            worksheet - string name of worksheet.
+        Returns:
+            list of lists of strings.
+        """
+        raise NotImplementedError
+
+    def get_worksheets(self, worksheets):
+        """
+        Returns every row of several worksheets. Backends that can read
+        them together in one request override this, the default reads
+        them one after another.
+        Args:
+            worksheets - list of string names of worksheets.
+        Returns:
+            dictionary of worksheet name to list of lists of strings.
+        """
+        return {worksheet: self.get_all_values(worksheet)
+                for worksheet in worksheets}
+
+    def row_values(self, worksheet, row_no):
+        """
+        Returns the values of one row of the worksheet.
+        Args:
+            worksheet - string name of worksheet, row_no - integer row.
+        Returns:
+            list of strings.
+        """
+        raise NotImplementedError
+
+    def col_values(self, worksheet, col_no):
+        """
+        Returns the values of one column of the worksheet, the header
+        included, up to the last row holding a value.
+        Args:
+            worksheet - string name of worksheet, col_no - integer column.
+        Returns:
+            list of strings.
+        """
+        raise NotImplementedError
+
+    def get_column_spans(self, worksheet, spans):
+        """
+        Returns the values of groups of adjacent columns of the worksheet.
+        Args:
+            worksheet - string name of worksheet, spans - list of
+            (first column, last column) tuples.
+        Returns:
+            list holding, for each span, the rows of its columns, the
+            header row included.
+        """
+        raise NotImplementedError
+
+    def write_cells(self, updates):
+        """
+        Writes runs of values into the worksheets as one transaction.
+        An update without a row number appends its values as a new row
+        below the last row of the worksheet, the row being chosen by
+        the backend when the write is made, so that sessions adding
+        rows at the same time never write to the same row.
+        Args:
+            updates - list of (worksheet, row number or None, column
+            number, list of values) tuples, each written to the right
+            of the given cell.
+        Returns:
+            list of the row number written by each update, None where
+            the row is not known yet.
+        """
+        raise NotImplementedError
+
+    def after_fork(self):
+        """
+        Replaces the connections inherited from a parent process, so a
+        forked session never shares a socket or file handle with it.
+        """
+
+
+class SheetsBackend(StorageBackend):
+    """
+    Stores the worksheets in the redeployment_report Google Sheets
+    workbook through gspread, sending every request through the
+    scheduler.
+    """
+
+    def __init__(self, creds_file="creds.json",
+                 spreadsheet="redeployment_report", scheduler=None):
+        import gspread
+        from google.oauth2.service_account import Credentials
+
+        self.scheduler = scheduler or RequestScheduler()
+        creds = Credentials.from_service_account_file(creds_file)
+        scoped_creds = creds.with_scopes(SCOPE)
+        self.client = gspread.authorize(scoped_creds)
+        self.spreadsheet = self.scheduler.call(self.client.open, spreadsheet)
+        self.worksheets = {}
+        self.worksheets_lock = threading.Lock()
+
+    def worksheet(self, worksheet):
+        """
+        Returns the gspread worksheet, opening it only once per session.
+        Worksheets are opened under a lock rather than shared as a read,
+        as a copy of the gspread object would lose its credentials.
+        Args:
+            worksheet - string name of worksheet.
+        Returns:
+            gspread worksheet object.
+        """
+        with self.worksheets_lock:
+            if worksheet not in self.worksheets:
+                self.worksheets[worksheet] = self.scheduler.call(
+                    self.spreadsheet.worksheet, worksheet)
+            return self.worksheets[worksheet]
+
+    def get_all_values(self, worksheet):
+        return self.scheduler.read(("get_all_values", worksheet),
+                                   self.worksheet(worksheet).get_all_values)
+
+    def get_worksheets(self, worksheets):
+        """
+        Reads all the worksheets with a single values_batch_get request,
+        padding the rows to the same length as get_all_values does.
+        """
+        ranges = [f"'{worksheet}'" for worksheet in worksheets]
+        response = self.scheduler.read(("values_batch_get", tuple(ranges)),
+                                       self.spreadsheet.values_batch_get,
+                                       ranges)
+        snapshots = {}
+        for worksheet, value_range in zip(
+                worksheets, response.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            width = max((len(row) for row in values), default=0)
+            snapshots[worksheet] = [row + [""] * (width - len(row))
+                                    for row in values]
+        return snapshots
+
+    def row_values(self, worksheet, row_no):
+        return self.scheduler.read(("row_values", worksheet, row_no),
+                                   self.worksheet(worksheet).row_values,
+                                   row_no)
+
+    def col_values(self, worksheet, col_no):
+        return self.scheduler.read(("col_values", worksheet, col_no),
+                                   self.worksheet(worksheet).col_values,
+                                   col_no)
+
+    def get_column_spans(self, worksheet, spans):
+        """
+        Reads all the spans with a single values_batch_get request.
+        """
+        ranges = [f"'{worksheet}'!{column_letter(first)}:"
+                  f"{column_letter(last)}" for first, last in spans]
+        response = self.scheduler.read(("values_batch_get", tuple(ranges)),
+                                       self.spreadsheet.values_batch_get,
+                                       ranges)
+        return [value_range.get("values", [])
+                for value_range in response.get("valueRanges", [])]
+
+    def write_cells(self, updates):
+        """
+        Sends the updates as one request, which the Sheets API applies
+        in full or not at all. New rows for a single worksheet are sent
+        with values_append, and their row numbers read back from the
+        range the API reports. Other updates are sent with a single
+        values_batch_update request, which updates queued by other
+        threads meanwhile may share. A write both appending rows and
+        updating cells, such as an exit, is sent as one
+        spreadsheets.batchUpdate request of AppendCellsRequests and
+        UpdateCellsRequests, whose reply does not give the rows the new
+        rows were appended to.
+        References:
+            The Google Sheets API spreadsheets.values.append method:
+            https://developers.google.com/sheets/api/reference/rest/v4/spreadsheets.values/append
+            The Google Sheets API spreadsheets.values.batchUpdate method:
+            https://developers.google.com/sheets/api/reference/rest/v4/spreadsheets.values/batchUpdate
+            The Google Sheets API spreadsheets.batchUpdate method:
+            https://developers.google.com/sheets/api/reference/rest/v4/spreadsheets/batchUpdate
+        """
+        rows = [row_no for worksheet, row_no, col_no, values in updates]
+        appends = [update for update in updates if update[1] is None]
+        if any(col_no != 1 for worksheet, row_no, col_no, values in appends):
+            raise ValueError("new rows are appended from column A")
+        if appends and len(appends) == len(updates) and len(
+                {update[0] for update in appends}) == 1:
+            response = self.scheduler.call(
+                self.spreadsheet.values_append, f"'{appends[0][0]}'!A1",
+                {"valueInputOption": "RAW",
+                 "insertDataOption": "INSERT_ROWS"},
+                {"values": [list(values) for worksheet, row_no, col_no,
+                            values in appends]},
+                retry=refused)
+            first_row = appended_row(response)
+            if first_row is None:
+                return rows
+            return list(range(first_row, first_row + len(appends)))
+        if appends:
+            self.scheduler.call(self.spreadsheet.batch_update,
+                                {"requests": self.cell_requests(updates)},
+                                retry=refused)
+            return rows
+        data = []
+        for worksheet, row_no, col_no, values in updates:
+            first_cell = f"{column_letter(col_no)}{row_no}"
+            last_cell = f"{column_letter(col_no + len(values) - 1)}{row_no}"
+            data.append({"range": f"'{worksheet}'!{first_cell}:{last_cell}",
+                         "values": [list(values)]})
+        self.scheduler.write(self.values_batch_update, data)
+        return rows
+
+    def cell_requests(self, updates):
+        """
+        Converts updates into the AppendCellsRequests and
+        UpdateCellsRequests of a spreadsheets.batchUpdate request, the
+        new rows of each worksheet being appended first.
+        Returns:
+            list of request dictionaries.
+        """
+        appends = {}
+        requests = []
+        for worksheet, row_no, col_no, values in updates:
+            cells = {"values": [cell_data(value) for value in values]}
+            sheet_id = self.worksheet(worksheet).id
+            if row_no is None:
+                if worksheet not in appends:
+                    appends[worksheet] = {"appendCells": {
+                        "sheetId": sheet_id, "rows": [],
+                        "fields": "userEnteredValue"}}
+                appends[worksheet]["appendCells"]["rows"].append(cells)
+                continue
+            requests.append({"updateCells": {
+                "range": {"sheetId": sheet_id, "startRowIndex": row_no - 1,
+                          "endRowIndex": row_no,
+                          "startColumnIndex": col_no - 1,
+                          "endColumnIndex": col_no - 1 + len(values)},
+                "rows": [cells], "fields": "userEnteredValue"}})
+        return list(appends.values()) + requests
+
+    def values_batch_update(self, data):
+        """
+        Sends value ranges to the workbook as they are, so that text such
+        as an employee number with a leading zero, a date or a name
+        starting with = is never converted or run as a formula. Numbers
+        are written as numbers.
+        """
+        self.spreadsheet.values_batch_update(
+            {"valueInputOption": "RAW", "data": data})
+
+    def after_fork(self):
+        """
+        Mounts new HTTP adapters so the forked session opens its own
+        connections, while keeping the authorised credentials, and gives
+        it a scheduler of its own, as locks held at the fork would
+        never be released.
+        """
+        import requests
+
+        self.scheduler = RequestScheduler()
+        self.worksheets_lock = threading.Lock()
+
+        session = getattr(self.client, "session", None)
+        if session is not None:
+            for prefix in list(session.adapters):
+                session.mount(prefix, requests.adapters.HTTPAdapter())
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores the worksheets in a local SQLite database. Each worksheet is
+    a table with one TEXT column per header and the sheet row number as
+    its primary key, and the Emp Number column is indexed.
+    """
+
+    def __init__(self, path="redeployment_report.db"):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.headers = {}
+        with self.connection:
+            for worksheet, headers in WORKSHEET_HEADERS.items():
+                columns = ", ".join(f'{quote(header)} TEXT NOT NULL'
+                                    " DEFAULT ''" for header in headers)
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(worksheet)}"
+                    f" (row_no INTEGER PRIMARY KEY, {columns})")
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS"
+                    f" {quote(worksheet + '_emp_number')}"
+                    f" ON {quote(worksheet)} ({quote('Emp Number')})")
+                table_info = self.connection.execute(
+                    f"PRAGMA table_info({quote(worksheet)})").fetchall()
+                self.headers[worksheet] = [column[1] for column in table_info
+                                           if column[1] != "row_no"]
+
+    def after_fork(self):
+        """
+        Opens a new database connection, as SQLite connections must not
+        be used across a fork.
+        """
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+
+    def _rows(self, worksheet):
+        """
+        Returns the data rows of a table keyed by their row number.
+        """
+        columns = ", ".join(quote(header)
+                            for header in self.headers[worksheet])
+        cursor = self.connection.execute(
+            f"SELECT row_no, {columns} FROM {quote(worksheet)}"
+            " ORDER BY row_no")
+        return {row[0]: list(row[1:]) for row in cursor}
+
+    def get_all_values(self, worksheet):
+        headers = self.headers[worksheet]
+        rows = self._rows(worksheet)
+        values = [list(headers)]
+        for row_no in range(2, max(rows, default=1) + 1):
+            values.append(rows.get(row_no, [""] * len(headers)))
+        return values
+
+    def row_values(self, worksheet, row_no):
+        if row_no == 1:
+            return list(self.headers[worksheet])
+        columns = ", ".join(quote(header)
+                            for header in self.headers[worksheet])
+        row = self.connection.execute(
+            f"SELECT {columns} FROM {quote(worksheet)} WHERE row_no = ?",
+            (row_no,)).fetchone()
+        return strip_trailing(list(row or []))
+
+    def col_values(self, worksheet, col_no):
+        """
+        Reads only the row numbers and the one column, which for the
+        Emp Number column is answered from its index.
+        """
+        headers = self.headers[worksheet]
+        if col_no > len(headers):
+            return []
+        rows = dict(self.connection.execute(
+            f"SELECT row_no, {quote(headers[col_no - 1])}"
+            f" FROM {quote(worksheet)}"))
+        values = [headers[col_no - 1]] + [
+            rows.get(row_no, "")
+            for row_no in range(2, max(rows, default=1) + 1)]
+        return strip_trailing(values)
+
+    def get_column_spans(self, worksheet, spans):
+        headers = self.headers[worksheet]
+        col_nos = [col_no for first, last in spans
+                   for col_no in range(first, last + 1)]
+        columns = ", ".join(quote(headers[col_no - 1]) for col_no in col_nos)
+        rows = {row[0]: row[1:] for row in self.connection.execute(
+            f"SELECT row_no, {columns} FROM {quote(worksheet)}")}
+        width = len(col_nos)
+        table = [headers[col_no - 1] for col_no in col_nos]
+        values = [table] + [rows.get(row_no, ("",) * width)
+                            for row_no in range(2, max(rows, default=1) + 1)]
+        blocks = []
+        position = 0
+        for first, last in spans:
+            size = last - first + 1
+            blocks.append([list(row[position:position + size])
+                           for row in values])
+            position += size
+        return blocks
+
+    def write_cells(self, updates):
+        """
+        Writes the updates in one transaction. New rows are inserted
+        with the row number after the last row of the table, which
+        SQLite assigns within the same statement.
+        """
+        rows = []
+        with self.connection:
+            for worksheet, row_no, col_no, values in updates:
+                if row_no is None:
+                    rows.append(self.append_row(worksheet, col_no, values))
+                    continue
+                rows.append(row_no)
+                if row_no < 2:
+                    raise ValueError(f"the header row of {worksheet}"
+                                     " cannot be written to")
+                headers = self.headers[worksheet][col_no - 1:
+                                                  col_no - 1 + len(values)]
+                if len(headers) != len(values):
+                    raise ValueError(f"{len(values)} values do not fit in"
+                                     f" {worksheet} from column {col_no}")
+                columns = ", ".join(quote(header) for header in headers)
+                placeholders = ", ".join("?" for header in headers)
+                assignments = ", ".join(f"{quote(header)} = excluded."
+                                        f"{quote(header)}"
+                                        for header in headers)
+                self.connection.execute(
+                    f"INSERT INTO {quote(worksheet)} (row_no, {columns})"
+                    f" VALUES (?, {placeholders}) ON CONFLICT(row_no)"
+                    f" DO UPDATE SET {assignments}",
+                    [row_no] + ["" if value is None else str(value)
+                                for value in values])
+        return rows
+
+    def append_row(self, worksheet, col_no, values):
+        """
+        Inserts values as a new row below the last row of a table.
+        Returns:
+            integer row number of the new row.
+        """
+        headers = self.headers[worksheet][col_no - 1:col_no - 1 + len(values)]
+        if len(headers) != len(values):
+            raise ValueError(f"{len(values)} values do not fit in"
+                             f" {worksheet} from column {col_no}")
+        columns = ", ".join(quote(header) for header in headers)
+        cursor = self.connection.execute(
+            f"INSERT INTO {quote(worksheet)} (row_no, {columns})"
+            f" SELECT COALESCE(MAX(row_no), 1) + 1, "
+            + ", ".join("?" for header in headers)
+            + f" FROM {quote(worksheet)}",
+            ["" if value is None else str(value) for value in values])
+        return cursor.lastrowid
+
+
+def quote(name):
+    """
+    Quotes a table or column name for use in an SQLite statement.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def cell_data(value):
+    """
+    Returns the CellData of a value as written RAW: numbers as numbers
+    and anything else as text.
+    """
+    if value is None:
+        return {}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def column_letter(col_no):
+    """
+    Returns the A1 letters of a column number, e.g. 14 is N and 28 is AB.
+    """
+    letters = ""
+    while col_no > 0:
+        col_no, remainder = divmod(col_no - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def strip_trailing(values):
+    """
+    Removes the empty values at the end of a list, as gspread does for
+    row and column reads.
+    """
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+def connect_backend():
+    """
+    Connects to the storage backend selected by the REDEPLOYMENT_STORAGE
+    environment variable. Google Sheets is used by default, "sqlite"
+    selects the database file named by REDEPLOYMENT_DB.
+    Returns:
+        StorageBackend.
+    Raises:
+        ValueError if the storage name is not recognised.
+    """
+    storage = os.environ.get("REDEPLOYMENT_STORAGE", "sheets").lower()
+    if storage == "sheets":
+        return SheetsBackend()
+    if storage == "sqlite":
+        return SQLiteBackend(os.environ.get("REDEPLOYMENT_DB",
+                                            "redeployment_report.db"))
+    raise ValueError(f"Unknown storage backend {storage}, use sheets"
+                     " or sqlite")
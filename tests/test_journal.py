@@ -0,0 +1,193 @@
+# Checks that the journal saves every write exactly once against the
+# in-memory stand-in for Google Sheets used by the benchmarks, when a
+# flush fails part way, when a journal left by a crashed session is
+# replayed and when another session appends rows in the meantime.
+# Run from the repository root with:
+#     python3 -m unittest discover tests
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import journal  # noqa: E402
+import workflows  # noqa: E402
+
+
+def emp_numbers(spreadsheet, worksheet):
+    """
+    Returns the employee numbers of a worksheet of the stand-in.
+    """
+    return [row[0] for row in spreadsheet.sheets[worksheet].rows[1:]]
+
+
+def stopped_process_id():
+    """
+    Returns the id of a process that has exited, to name a journal left
+    behind by a crashed session.
+    """
+    process_id = os.fork()
+    if process_id == 0:
+        os._exit(0)
+    os.waitpid(process_id, 0)
+    return process_id
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spreadsheet = workflows.FakeSpreadsheet(
+            workflows.seed_worksheets(3), 0)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch.object(journal, "JOURNAL_RETRY_DELAY", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def journalled(self):
+        return journal.JournalledBackend(
+            workflows.FakeSheetsBackend(self.spreadsheet),
+            self.directory.name)
+
+    def fail_after_append(self, emp_number, error):
+        """
+        Makes the first append of an employee number raise the error
+        after the row has been added, as when the connection drops
+        before the response arrives.
+        """
+        values_append = self.spreadsheet.values_append
+        failed = []
+
+        def append(a1_range, params, body):
+            response = values_append(a1_range, params, body)
+            if body["values"][0][0] == emp_number and not failed:
+                failed.append(emp_number)
+                raise error
+            return response
+
+        self.spreadsheet.values_append = append
+
+    def hold_flusher(self, backend):
+        """
+        Queues a write which the flusher sends only once flusher_held
+        is set.
+        """
+        self.flusher_held = threading.Event()
+        values_append = self.spreadsheet.values_append
+
+        def append(a1_range, params, body):
+            if body["values"][0][0] == "999990":
+                self.flusher_held.wait()
+            return values_append(a1_range, params, body)
+
+        self.spreadsheet.values_append = append
+        backend.write_cells([("redeployment_pool", None, 1,
+                              ["999990", "Held"])])
+
+    def test_retried_flush_appends_once(self):
+        self.fail_after_append("999999", ConnectionError("reset"))
+        backend = self.journalled()
+        backend.write_cells([("redeployment_pool", None, 1,
+                              ["999999", "Ann"])])
+        self.assertTrue(backend.drain(5))
+        self.assertEqual(
+            emp_numbers(self.spreadsheet, "redeployment_pool").count(
+                "999999"), 1)
+
+    def test_entries_written_one_by_one_are_not_sent_again(self):
+        values_append = self.spreadsheet.values_append
+
+        def append(a1_range, params, body):
+            if len(body["values"]) > 1:
+                raise ValueError("refused")
+            return values_append(a1_range, params, body)
+
+        self.spreadsheet.values_append = append
+        self.fail_after_append("999998", ConnectionError("reset"))
+        backend = self.journalled()
+        # The flusher is held on a first write while the two entries
+        # are queued, so that they are flushed as one batch.
+        self.hold_flusher(backend)
+        for emp_number in ["999997", "999998"]:
+            backend.write_cells([("redeployment_pool", None, 1,
+                                  [emp_number, "Ann"])])
+        self.flusher_held.set()
+        self.assertTrue(backend.drain(5))
+        numbers = emp_numbers(self.spreadsheet, "redeployment_pool")
+        self.assertEqual(numbers.count("999997"), 1)
+        self.assertEqual(numbers.count("999998"), 1)
+
+    def test_replay_skips_rows_sent_before_the_crash(self):
+        pool = self.spreadsheet.sheets["redeployment_pool"].rows
+        pool.append(["777001", "Flushed"])
+        pool.append(["777002", "Sent"])
+        writes = [
+            {"write": 1, "updates": [["redeployment_pool", None, 1,
+                                      ["777001", "Flushed"]]]},
+            {"flushed": 1},
+            {"write": 2, "updates": [["redeployment_pool", None, 1,
+                                      ["777002", "Sent"]]]},
+            {"write": 3, "updates": [["redeployment_pool", 2, 2,
+                                      ["Replayed"]]]},
+            {"write": 4, "updates": [["redeployment_pool", None, 1,
+                                      ["777003", "Unsent"]]]},
+            ]
+        path = os.path.join(self.directory.name,
+                            f"{stopped_process_id()}.log")
+        with open(path, "w", encoding="utf-8") as journal_file:
+            for write in writes:
+                journal_file.write(json.dumps(write) + "\n")
+            journal_file.write('{"write": 5, "upda')
+        backend = self.journalled()
+        self.assertTrue(backend.drain(5))
+        numbers = emp_numbers(self.spreadsheet, "redeployment_pool")
+        for emp_number in ["777001", "777002", "777003"]:
+            self.assertEqual(numbers.count(emp_number), 1)
+        self.assertEqual(pool[1][1], "Replayed")
+        self.assertFalse(os.path.exists(path))
+
+    def test_row_given_by_emp_number_follows_the_append(self):
+        backend = self.journalled()
+        self.hold_flusher(backend)
+        backend.write_cells([("redeployment_pool", None, 1,
+                              ["999999", "Ann"])])
+        self.assertTrue(backend.appends_employee("redeployment_pool",
+                                                 "999999"))
+        pool = self.spreadsheet.sheets["redeployment_pool"].rows
+        pool.append(["555555", "Other"])
+        backend.write_cells([("redeployment_pool",
+                              journal.employee_key("999999"), 2, ["Anne"])])
+        self.assertEqual(backend.col_values("redeployment_pool", 2)[-3:],
+                         ["Other", "Held", "Anne"])
+        self.flusher_held.set()
+        self.assertTrue(backend.drain(5))
+        self.assertEqual(pool[-3:], [["555555", "Other"], ["999990", "Held"],
+                                     ["999999", "Anne"]])
+
+    def test_reaped_session_journal_is_replayed(self):
+        backend = self.journalled()
+        process_id = os.fork()
+        if process_id == 0:
+            backend.after_fork()
+            backend.file.write(json.dumps(
+                {"write": 1, "updates": [["redeployment_pool", None, 1,
+                                          ["888888", "Child"]]]}) + "\n")
+            backend.file.flush()
+            os._exit(0)
+        os.waitpid(process_id, 0)
+        self.assertEqual(backend.replay_stale_journals(), 1)
+        self.assertTrue(backend.drain(5))
+        self.assertIn("888888",
+                      emp_numbers(self.spreadsheet, "redeployment_pool"))
+        self.assertEqual(os.listdir(self.directory.name),
+                         [os.path.basename(backend.path)])
+
+
+if __name__ == "__main__":
+    unittest.main()
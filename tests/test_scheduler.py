@@ -0,0 +1,131 @@
+# Checks that the request scheduler sends identical reads in flight
+# once, batches the writes queued behind another and retries refused
+# requests, reporting every attempt to the request observers.
+# Run from the repository root with:
+#     python3 -m unittest discover tests
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+
+class Refused(Exception):
+    """
+    A request refused for the quota, as gspread raises it.
+    """
+
+    class response:
+        status_code = 429
+        headers = {"Retry-After": "0"}
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = storage.RequestScheduler(requests_per_minute=1e9,
+                                                  burst=1e9)
+
+    def test_identical_reads_in_flight_are_sent_once(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def get_all_values():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return [["Emp Number"], ["100000"]]
+
+        waiting = threading.Semaphore(0)
+        wait = storage.ScheduledRequest.wait
+
+        def shared_wait(request):
+            waiting.release()
+            return wait(request)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            self.scheduler.read("key", get_all_values))) for _ in range(3)]
+        with mock.patch.object(storage.ScheduledRequest, "wait",
+                               shared_wait):
+            threads[0].start()
+            started.wait()
+            for thread in threads[1:]:
+                thread.start()
+            for thread in threads[1:]:
+                waiting.acquire()
+            release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[["Emp Number"], ["100000"]]] * 3)
+        self.assertIsNot(results[0][1], results[1][1])
+
+    def test_writes_queued_behind_a_write_are_batched(self):
+        started = threading.Event()
+        release = threading.Event()
+        batches = []
+
+        def values_batch_update(data):
+            batches.append(data)
+            started.set()
+            release.wait()
+
+        first = threading.Thread(target=self.scheduler.write,
+                                 args=(values_batch_update, ["A1"]))
+        first.start()
+        started.wait()
+        queued = [threading.Thread(target=self.scheduler.write,
+                                   args=(values_batch_update, [cell]))
+                  for cell in ["A2", "A3"]]
+        for thread in queued:
+            thread.start()
+        # Both are queued, then wait on the write lock until the first
+        # write has been sent.
+        while len(self.scheduler.writes) < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in [first] + queued:
+            thread.join()
+        self.assertEqual(batches[0], ["A1"])
+        self.assertEqual(sorted(batches[1]), ["A2", "A3"])
+        self.assertEqual(len(batches), 2)
+
+    def test_refused_request_is_retried_and_reported(self):
+        attempts = []
+        responses = [Refused(), Refused(), "appended"]
+
+        def values_append():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with mock.patch.object(storage, "REQUEST_OBSERVERS",
+                               [lambda *attempt: attempts.append(attempt)]):
+            result = self.scheduler.call(values_append,
+                                         retry=storage.refused)
+        self.assertEqual(result, "appended")
+        self.assertEqual([(name, attempt, type(error))
+                          for name, attempt, seconds, error in attempts],
+                         [("values_append", 0, Refused),
+                          ("values_append", 1, Refused),
+                          ("values_append", 2, type(None))])
+
+    def test_request_that_may_have_been_applied_is_not_retried(self):
+        def values_append():
+            raise ConnectionError("reset")
+
+        with self.assertRaises(ConnectionError):
+            self.scheduler.call(values_append, retry=storage.refused)
+
+
+if __name__ == "__main__":
+    unittest.main()
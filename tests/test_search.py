@@ -0,0 +1,42 @@
+# Checks that the employee search finds employees by number, by the
+# start of any word of their name, by each part of a hyphenated name or
+# a name with an apostrophe, and despite a typo.
+# Run from the repository root with:
+#     python3 -m unittest discover tests
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import run  # noqa: E402
+
+LABELS = ["100001 Mary-Ann O'Neil", "100002 Ann Smith", "100003 John Smythe",
+          "100004 Neil Jones"]
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.search = run.EmployeeSearch(LABELS)
+
+    def test_number_and_prefix(self):
+        self.assertEqual(self.search.search("100003")[0], LABELS[2])
+        self.assertEqual(self.search.search("smy"), [LABELS[2]])
+        self.assertEqual(self.search.find("100002 Ann Smith"), LABELS[1])
+
+    def test_parts_of_joined_names(self):
+        self.assertCountEqual(self.search.search("ann"),
+                              [LABELS[0], LABELS[1]])
+        self.assertIn(LABELS[0], self.search.search("neil"))
+        self.assertEqual(self.search.search("ann neil")[0], LABELS[0])
+        self.assertEqual(self.search.search("o'neil")[0], LABELS[0])
+
+    def test_typo(self):
+        self.assertEqual(self.search.search("jnoes"), [LABELS[3]])
+        self.assertEqual(self.search.search("smiht")[0], LABELS[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# Checks that a value accepted or refused when typed in is accepted or
+# refused alike when imported from a file, as both go through the same
+# checks. The employee numbers already saved are read from the
+# in-memory stand-in for Google Sheets used by the benchmarks.
+# Run from the repository root with:
+#     python3 -m unittest discover tests
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import journal  # noqa: E402
+import run  # noqa: E402
+import workflows  # noqa: E402
+
+VALID_EMPLOYEE = {"Emp Number": "900000", "Name": "Ann", "Surname": "Lee",
+                  "Age": "40", "Gender": "female", "Department": "Sales",
+                  "Position": "Rep", "Salary": "5000", "Tenure -years": "3",
+                  "Tenure -months": "4", "Entry Date": "02/02/2022"}
+
+# The values tried for each column and the function checking the value
+# when it is typed in.
+
+CASES = {
+    "Emp Number": (["123456", "12345", "1234567", "12a456", "", "100001",
+                    " 654321 "], run.validate_number),
+    "Name": (["Ann", "Mary-Ann", "123", "R2D2", "", "O'Neil"],
+             run.validate_data),
+    "Age": (["18", "75", "17", "76", "40.5", "forty", "-40", "+40"],
+            lambda value: run.validate_range(value, "18 to 75",
+                                             run.AGE_RANGE)),
+    "Salary": (["100", "100000", "99", "100001", "5 000"],
+               lambda value: run.validate_range(value, "100 to 100 000",
+                                                run.SALARY_RANGE)),
+    "Tenure -months": (["1", "10", "0", "11", "12"],
+                       lambda value: run.validate_range(value, "1 to 11",
+                                                        run.MONTH_RANGE)),
+    "Entry Date": (["01/07/2021", "31/02/2021", "2021-07-01", "1/7/2021",
+                    "01/07/2999", ""], run.validate_date),
+    }
+
+
+class ValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        spreadsheet = workflows.FakeSpreadsheet(workflows.seed_worksheets(3),
+                                                0)
+        run.BACKEND = journal.JournalledBackend(
+            workflows.FakeSheetsBackend(spreadsheet),
+            os.path.join(self.directory.name, "journal"))
+        run.HEADER_INDEX.clear()
+        run.EMPLOYEE_INDEX.clear()
+        self.addCleanup(setattr, run, "BACKEND", None)
+
+    def import_errors(self, header, values):
+        """
+        Validates a file of employees, each valid but for the value of
+        one column, as import_employees does.
+        Returns:
+            set of the rows refused for that column.
+        """
+        path = os.path.join(self.directory.name, "employees.csv")
+        with open(path, "w") as import_file:
+            import_file.write(",".join(run.IMPORT_HEADERS) + "\n")
+            for row, value in enumerate(values):
+                employee = dict(VALID_EMPLOYEE, **{header: value})
+                if header != "Emp Number":
+                    employee["Emp Number"] = str(900000 + row)
+                import_file.write(",".join(employee[column]
+                                           for column in run.IMPORT_HEADERS)
+                                  + "\n")
+        df = run.read_import_file(path)
+        errors = run.validate_import(
+            df, run.employee_numbers("redeployment_pool"))
+        return {error.row for error in errors if error.field == header}
+
+    def test_typed_and_imported_values_are_checked_alike(self):
+        for header, (values, validate) in CASES.items():
+            refused = self.import_errors(header, values)
+            for row, value in enumerate(values):
+                with self.subTest(header=header, value=value):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        accepted = validate(value.strip())
+                    self.assertEqual(accepted, row not in refused)
+
+
+if __name__ == "__main__":
+    unittest.main()